@@ -0,0 +1,90 @@
+"""Compare the per-edge Python classification loop with the vectorized classify_road_segments
+
+    python benchmarks/bench_classify.py [--half-size DEG]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from map_art_app.roads import classify_road_segments, extract_graph_edges
+from synthetic import city_graph
+
+COLORS = {"<100": "#d40a47", "100-200": "#e78119", "200-400": "#30bab0",
+          "400-800": "#bbbbbb", ">800": "#ffffff", "primary": "#000000"}
+WIDTHS = {"<100": 0.3, "100-200": 0.45, "200-400": 0.6, "400-800": 0.75, ">800": 0.5, "primary": 0.8}
+
+
+def legacy_extract(G):
+    u, v, key, data = zip(*G.edges(keys=True, data=True))
+    return list(u), list(v), list(key), list(data)
+
+
+def legacy_classify(data, custom_colors, custom_widths):
+    """The original if/elif loop, kept as the reference implementation"""
+    road_colors = []
+    road_widths = []
+    for item in data:
+        if "length" in item:
+            if item["length"] <= 100:
+                linewidth, color = custom_widths["<100"], custom_colors["<100"]
+            elif item["length"] <= 200:
+                linewidth, color = custom_widths["100-200"], custom_colors["100-200"]
+            elif item["length"] <= 400:
+                linewidth, color = custom_widths["200-400"], custom_colors["200-400"]
+            elif item["length"] <= 800:
+                linewidth, color = custom_widths["400-800"], custom_colors["400-800"]
+            else:
+                linewidth, color = custom_widths[">800"], custom_colors[">800"]
+            if "primary" in item.get("highway", ""):
+                linewidth, color = custom_widths["primary"], custom_colors["primary"]
+        else:
+            linewidth, color = custom_widths[">800"], custom_colors[">800"]
+        road_colors.append(color)
+        road_widths.append(linewidth)
+    return road_colors, road_widths
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--half-size", type=float, default=0.1, help="half width of the synthetic city in degrees")
+    args = parser.parse_args()
+
+    G = city_graph(42.3579, -71.0604, args.half_size)
+    # Exercise the edge cases of the original loop: missing lengths and merged highway lists
+    for i, (_, _, d) in enumerate(G.edges(data=True)):
+        if i % 97 == 0:
+            del d["length"]
+        elif i % 89 == 0:
+            d["highway"] = ["secondary", "primary"]
+    print(f"{G.number_of_edges():,} edges")
+
+    t_legacy_extract, (_, _, _, data) = best_of(lambda: legacy_extract(G))
+    t_legacy, (legacy_colors, legacy_widths) = best_of(lambda: legacy_classify(data, COLORS, WIDTHS))
+    t_extract, edges = best_of(lambda: extract_graph_edges(G))
+    t_classify, (colors, widths) = best_of(lambda: classify_road_segments(edges, COLORS, WIDTHS))
+
+    assert list(colors) == legacy_colors, "vectorized colors differ from the reference loop"
+    assert np.array_equal(widths, np.array(legacy_widths)), "vectorized widths differ from the reference loop"
+
+    print(f"extract   legacy {t_legacy_extract * 1000:8.1f} ms   columnar   {t_extract * 1000:8.1f} ms")
+    print(f"classify  legacy {t_legacy * 1000:8.1f} ms   vectorized {t_classify * 1000:8.1f} ms "
+          f"({t_legacy / t_classify:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Peak memory of the strip-streamed PNG export at a 60 x 90 cm, 300 dpi print size
+
+    python benchmarks/bench_export.py [--compare]
+
+--compare also runs the old single-figure savefig path for reference (needs several hundred MB).
+Peak RSS is read from /proc (Linux), resetting the high-water mark before each measurement.
+"""
+import argparse
+import gc
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from map_art_app.export import PRINT_SIZES, export_png, print_size_pixels
+from map_art_app.pipeline import freeze_style
+from map_art_app.render import EdgeGeometry, add_legend, plot_graph
+from map_art_app.roads import extract_graph_edges, road_classes
+from synthetic import city_graph
+
+PEAK_CAP_MB = 256
+COLORS = {"<100": "#d40a47", "100-200": "#e78119", "200-400": "#30bab0",
+          "400-800": "#bbbbbb", ">800": "#ffffff", "primary": "#ffffff"}
+WIDTHS = {"<100": 0.3, "100-200": 0.45, "200-400": 0.6, "400-800": 0.75, ">800": 0.5, "primary": 0.8}
+
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1]) / 1024
+
+
+def peak_rss_delta(fn):
+    """Run fn and return (seconds, result, MB the RSS high-water mark rose above the starting RSS)"""
+    gc.collect()
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    before = _status_mb("VmRSS")
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    return elapsed, result, _status_mb("VmHWM") - before
+
+
+class CountingSink(io.RawIOBase):
+    """Discards bytes but counts them, so the encoded file itself is not part of the measurement"""
+
+    def __init__(self):
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+
+def stream_export(geometry, classes, style, width_px, height_px):
+    sink = CountingSink()
+    export_png(sink, geometry, classes, style, width_px, height_px, dpi=300)
+    return sink.size
+
+
+def full_figure_export(geometry, classes, width_px, height_px):
+    fig, ax = plot_graph(geometry, classes, COLORS, WIDTHS, "#31bab0", figsize=(width_px / 300, height_px / 300))
+    add_legend(ax, COLORS)
+    sink = CountingSink()
+    fig.savefig(sink, format="png", dpi=300)
+    return sink.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--compare", action="store_true", help="also measure a single full-size savefig")
+    args = parser.parse_args()
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    G = city_graph(42.3579, -71.0604, 0.03)
+    geometry = EdgeGeometry.from_graph(G)
+    lengths, _, _, primary = extract_graph_edges(G)
+    classes = road_classes(lengths, primary)
+    geometry.segments()
+    del G
+    style = freeze_style(COLORS, WIDTHS, "#31bab0", True)
+    width_px, height_px = print_size_pixels(*PRINT_SIZES["60 x 90 cm"], dpi=300)
+    print(f"{len(geometry):,} edges -> {width_px} x {height_px} px "
+          f"({width_px * height_px * 4 / 1024 ** 2:.0f} MB as a single RGBA buffer)")
+
+    elapsed, size, peak = peak_rss_delta(lambda: stream_export(geometry, classes, style, width_px, height_px))
+    print(f"strip export   {elapsed:6.2f} s  {size / 1024 ** 2:6.1f} MB PNG  peak +{peak:6.0f} MB RSS")
+    if args.compare:
+        elapsed, size, peak_full = peak_rss_delta(lambda: full_figure_export(geometry, classes, width_px, height_px))
+        print(f"full savefig   {elapsed:6.2f} s  {size / 1024 ** 2:6.1f} MB PNG  peak +{peak_full:6.0f} MB RSS")
+    assert peak < PEAK_CAP_MB, f"strip export peaked at +{peak:.0f} MB, over the {PEAK_CAP_MB} MB cap"
+
+
+if __name__ == "__main__":
+    main()
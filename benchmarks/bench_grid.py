@@ -0,0 +1,66 @@
+"""Wall time of a 3x3 multi-city grid poster against the number of worker processes
+
+    python benchmarks/bench_grid.py [--workers 1 2 4] [--size "18 x 24 in"] [--dpi 150] [--radius-km 2]
+
+Nine synthetic cities at different latitudes (so their panels span different longitude ranges for the same ground
+distance) are prefetched into a graph store in a temporary directory, with their road networks built, then the same
+grid is rendered once per worker count from that store, offline. Panels are independent, so the rendering stage should shrink with the worker count up
+to the number of cores; fetching and compositing run in the parent and stay flat.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from map_art_app.batch import network_for_source
+from map_art_app.graph_store import GraphStore
+from map_art_app.grid import grid_panels, run_grid
+from map_art_app.tiles import TiledGraphCache
+from synthetic import lattice_graph
+
+CITIES = [("Oslo", 59.91, 10.75), ("Edinburgh", 55.95, -3.19), ("Berlin", 52.52, 13.40), ("Paris", 48.86, 2.35),
+          ("Boston", 42.36, -71.06), ("Tokyo", 35.68, 139.69), ("Cairo", 30.04, 31.24), ("Mumbai", 19.08, 72.88),
+          ("Singapore", 1.29, 103.85)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to time")
+    parser.add_argument("--size", default="18 x 24 in", help="print size of the poster")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("--radius-km", type=float, default=2.0, help="ground distance from each center to its edges")
+    args = parser.parse_args()
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    spec = {"places": [{"name": name, "center": [lat, lon]} for name, lat, lon in CITIES], "columns": 3,
+            "preset": "Midnight", "size": args.size, "dpi": args.dpi, "radius_km": args.radius_km}
+    print(f"{os.cpu_count()} CPUs available")
+    with tempfile.TemporaryDirectory() as tmp:
+        store_root = os.path.join(tmp, "store")
+        tiles = TiledGraphCache(GraphStore(store_root, offline=False), fetch=lattice_graph)
+        # Networks are built here too, so every timed run only maps them
+        for panel in grid_panels(spec):
+            network_for_source(panel.source, tiles)
+
+        print(f"{'workers':>7} {'render':>8} {'compose':>8} {'total':>8} {'speedup':>8}")
+        first = None
+        for workers in args.workers:
+            out = os.path.join(tmp, f"grid-{workers}.png")
+            start = time.perf_counter()
+            summary = run_grid(spec, out, workers=workers, store=GraphStore(store_root, offline=True),
+                               log=lambda *a: None)
+            total = time.perf_counter() - start
+            assert not summary["failed"], summary["failed"]
+            first = first or total
+            print(f"{workers:>7} {summary['render_seconds']:>7.2f}s {summary['compose_seconds']:>7.2f}s "
+                  f"{total:>7.2f}s {first / total:>7.2f}x")
+        print(f"{summary['panels']} panels of {summary['panel_px']} px, poster {os.path.getsize(out) / 1024 ** 2:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
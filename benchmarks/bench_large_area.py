@@ -0,0 +1,96 @@
+"""Large-area place fetch: one request for the whole polygon against cells fetched on a throttled worker pool
+
+    python benchmarks/bench_large_area.py [--half-size DEG] [--latency S]
+
+The "server" is a GraphFixture over a synthetic unsimplified street lattice (with streets removed so that
+simplification has chains to merge), answering each request after a delay proportional to the area asked for, as
+Overpass roughly does. Each mode runs in a fresh process so its peak RSS is its own. The cell-by-cell graph must
+match the one-cell graph exactly: same edges, same lengths, same geometry.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from shapely.geometry import Point
+
+from map_art_app.graph_store import load_graph, save_graph
+from map_art_app.large_area import GraphFixture, LargeAreaFetcher, peak_rss_mb
+from synthetic import lattice_graph
+
+CENTER = (-118.25, 34.05)
+
+
+class AreaLatency(GraphFixture):
+    """Fixture whose response time grows with the requested area"""
+
+    def __init__(self, graph, seconds_per_deg2):
+        super().__init__(graph)
+        self.seconds_per_deg2 = seconds_per_deg2
+
+    def __call__(self, polygon, network_type="all"):
+        time.sleep(self.seconds_per_deg2 * polygon.area)
+        return super().__call__(polygon, network_type)
+
+
+def fixture_graph(half_size):
+    G = lattice_graph((CENTER[0] - half_size, CENTER[1] - half_size, CENTER[0] + half_size, CENTER[1] + half_size))
+    # Drop about a third of the streets so many nodes end up with two neighbours
+    rng = np.random.default_rng(0)
+    drop = [(u, v) for u, v, d in G.edges(data=True) if not d["reversed"] and rng.random() < 0.35]
+    G.remove_edges_from(drop + [(v, u) for u, v in drop])
+    return G
+
+
+def run(path, half_size, latency, cell_size, workers, interval):
+    fixture = AreaLatency(load_graph(path), latency)
+    fetcher = LargeAreaFetcher(cell_size=cell_size, workers=workers, interval=interval, fetch=fixture)
+    polygon = Point(CENTER).buffer(half_size * 0.9)
+    start = time.perf_counter()
+    G = fetcher.graph_from_polygon(polygon)
+    seconds = time.perf_counter() - start
+    edges = sorted((u, v, round(d["length"], 6), tuple(d["geometry"].coords) if "geometry" in d else ())
+                   for u, v, d in G.edges(data=True))
+    return seconds, fetcher.last_stats, peak_rss_mb(), edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--half-size", type=float, default=0.08, help="half width of the synthetic metro in degrees")
+    parser.add_argument("--latency", type=float, default=300.0, help="server seconds per square degree requested")
+    args = parser.parse_args()
+
+    G = fixture_graph(args.half_size)
+    print(f"fixture: {len(G):,} nodes, {G.number_of_edges():,} unsimplified edges")
+    modes = [("one request", 10.0, 1, 0.0), ("cells, 1 worker", 0.02, 1, 0.0),
+             ("cells, 4 workers", 0.02, 4, 0.0), ("cells, 4 workers, 0.2 s throttle", 0.02, 4, 0.2)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fixture.npz")
+        save_graph(G, path)
+        del G
+        results = {}
+        ctx = multiprocessing.get_context("spawn")
+        for label, cell_size, workers, interval in modes:
+            with ctx.Pool(1) as pool:
+                results[label] = pool.apply(run, (path, args.half_size, args.latency, cell_size, workers, interval))
+
+    reference = results["one request"][3]
+    print(f"{'mode':<34} {'cells':>5} {'seconds':>8} {'fetch':>7} {'simplify':>8} {'merge':>6} {'peak RSS':>9}  match")
+    for label, (seconds, stats, rss, edges) in results.items():
+        print(f"{label:<34} {stats['cells']:>5} {seconds:>8.2f} {stats['fetch_seconds']:>7.2f} "
+              f"{stats['simplify_seconds']:>8.2f} {stats['merge_seconds']:>6.2f} "
+              f"{'n/a' if rss is None else f'{rss:.0f}MB':>9}  {edges == reference}")
+        assert edges == reference, f"{label}: merged graph differs from the one-request graph"
+    print(f"{len(reference):,} simplified edges; "
+          f"{results['cells, 4 workers'][1]['border_nodes_joined']:,} border nodes joined back up")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Layer toggling on a rendered map: what each step fetches and how long it takes compared with a fresh render
+
+    python benchmarks/bench_layers.py [--half-size DEG]
+
+Replays one session: roads only, then water and parks together, then buildings, then parks off again, against a
+graph store in a temporary directory and synthetic OSM features (see synthetic.features_frame). Each step is timed
+from the job's stage checkpoints: "prepare" covers fetching the layers, "draw" building the figure's collections
+and "encode" rasterizing and encoding the PNG.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from map_art_app.graph_store import GraphStore
+from map_art_app.jobs import RenderJob
+from map_art_app.layers import LAYERS, LayerCache
+from map_art_app.network import RoadNetwork
+from map_art_app.pipeline import MapRenderer, render_preview
+from map_art_app.presets import preset_style
+from synthetic import city_graph, features_frame
+
+STEPS = [("roads only", ()), ("+ water, parks", ("parks", "water")), ("+ buildings", ("parks", "water", "buildings")),
+         ("- parks", ("water", "buildings"))]
+
+
+def timed_render(source, style, renderer, network, layer_style, fetch_layers):
+    job = RenderJob(None)
+    render_preview(source, style, renderer, lambda source: network, job.set_stage, None, None, layer_style,
+                   fetch_layers)
+    t = job.timings
+    full = time.perf_counter() - job.started
+    return t["drawing"], t["encoding"] - t["drawing"], full - t["encoding"], full
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--half-size", type=float, default=0.03, help="half width of the synthetic city in degrees")
+    args = parser.parse_args()
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    network = RoadNetwork.from_graph(city_graph(42.3579, -71.0604, args.half_size))
+    source = ("bbox", args.half_size)
+    style = preset_style("Midnight")
+    queries = []
+
+    def fetch(bbox, tags):
+        queries.append(sorted(tags))
+        return features_frame(bbox, tags)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        layers = LayerCache(GraphStore(tmp, offline=False), fetch=fetch)
+        renderer = MapRenderer()
+        print(f"{len(network):,} edges")
+        print(f"{'step':<18} {'queries':>7} {'prepare':>8} {'draw':>6} {'encode':>7} {'total':>6}   fresh render")
+        for label, names in STEPS:
+            layer_style = tuple((name, LAYERS[name]["color"]) for name in names)
+            before = len(queries)
+            prepare, draw, encode, total = timed_render(source, style, renderer, network, layer_style, layers.layers)
+            # The same map drawn by a session that has not rendered anything yet (layers already cached)
+            fresh = timed_render(source, style, MapRenderer(), network, layer_style, layers.layers)[3]
+            print(f"{label:<18} {len(queries) - before:>7} {prepare:>8.2f} {draw:>6.2f} {encode:>7.2f} {total:>6.2f}"
+                  f"   {fresh:>6.2f}")
+        sizes = {name: len(layer) for name, layer in layers.layers(network.bounds, STEPS[2][1]).items()}
+    print(f"queries: {queries}")
+    print(f"polygons per layer: {sizes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Memory held per cached source: the networkx graph (plus geometry and classes built from it) against a RoadNetwork
+
+    python benchmarks/bench_network.py [--half-size DEG]
+
+The old render path kept the graph loaded from the store, its EdgeGeometry and its class array per source; now only
+the RoadNetwork is kept, memory-mapped from a file every process shares. Python heap is measured with tracemalloc
+(numpy reports its buffers to it); mapped pages are listed separately since they live in the page cache. Both
+representations must draw the same thing, so their render fingerprints have to match.
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from map_art_app.graph_store import load_graph, save_graph
+from map_art_app.network import RoadNetwork, load_network, save_network
+from map_art_app.render import EdgeGeometry
+from map_art_app.render_cache import network_fingerprint
+from map_art_app.roads import extract_graph_edges, road_classes
+from synthetic import city_graph
+
+
+def measure(build):
+    """(result, seconds, bytes of Python heap still held by the result)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, held
+
+
+def old_stages(path):
+    G = load_graph(path)
+    lengths, _, _, primary = extract_graph_edges(G)
+    return G, EdgeGeometry.from_graph(G), road_classes(lengths, primary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--half-size", type=float, default=0.05, help="half width of the synthetic city in degrees")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        graph_path, network_path = os.path.join(tmp, "graph.npz"), os.path.join(tmp, "network.rnet")
+        G = city_graph(42.3579, -71.0604, args.half_size)
+        edges = G.number_of_edges()
+        save_graph(G, graph_path)
+        del G
+
+        (G, geometry, classes), old_seconds, old_bytes = measure(lambda: old_stages(graph_path))
+        network, build_seconds, built_bytes = measure(lambda: RoadNetwork.from_graph(G))
+        with open(network_path, "wb") as f:
+            save_network(network, f)
+        assert network_fingerprint(geometry, classes) == network_fingerprint(network, network.classes)
+        del G, geometry, classes, network
+
+        mapped, map_seconds, mapped_bytes = measure(lambda: load_network(network_path))
+        assert network_fingerprint(mapped, mapped.classes) == network_fingerprint(*old_stages(graph_path)[1:])
+        file_bytes = os.path.getsize(network_path)
+
+    print(f"{edges:,} edges, {len(mapped.vertices):,} vertices")
+    print(f"{'held per source':<34} {'heap':>9} {'per edge':>9} {'shared':>9} {'seconds':>8}")
+    print(f"{'graph + geometry + classes':<34} {old_bytes / 1024 ** 2:>7.1f}MB {old_bytes / edges:>8.0f}B "
+          f"{'-':>9} {old_seconds:>8.3f}")
+    print(f"{'RoadNetwork, in memory':<34} {built_bytes / 1024 ** 2:>7.1f}MB {built_bytes / edges:>8.0f}B "
+          f"{'-':>9} {build_seconds:>8.3f}")
+    print(f"{'RoadNetwork, memory-mapped':<34} {mapped_bytes / 1024 ** 2:>7.1f}MB {mapped_bytes / edges:>8.0f}B "
+          f"{file_bytes / 1024 ** 2:>7.1f}MB {map_seconds:>8.3f}")
+    print(f"{old_bytes / built_bytes:.1f}x less private memory in memory, {old_bytes / file_bytes:.1f}x counting the "
+          f"mapped file; fingerprints match")
+
+
+if __name__ == "__main__":
+    main()
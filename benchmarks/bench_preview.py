@@ -0,0 +1,125 @@
+"""Per-rerun st_folium payload and build time: fresh folium.Map every rerun vs. one base map per session
+
+    python benchmarks/bench_preview.py
+
+Replays a session (style-only reruns, a marker move, a generated map with its road overlay, a zoom change) and
+captures the arguments st_folium hands to its frontend component. Streamlit only re-sends an element whose
+serialized message (of at least global.minCachedMessageSize) it has already sent as a short hash reference, so a
+rerun costs the full payload only when the arguments changed. (folium output only settles after an object's
+first render, so a new map or layer goes out in full twice before it is served from the cache.)
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+warnings.filterwarnings("ignore")
+
+import folium
+import streamlit_folium
+from streamlit import config
+
+from map_art_app.presets import preset_style
+from map_art_app.preview import base_map, detach_layers, marker_layer, overlay_geojson, overlay_layer
+from map_art_app.render import EdgeGeometry
+from map_art_app.roads import extract_graph_edges, road_classes
+from synthetic import city_graph
+
+CENTER = [42.3579, -71.0604]
+REF_BYTES = 100
+
+captured = []
+streamlit_folium._component_func = lambda **kwargs: captured.append(kwargs)
+
+
+def session_steps():
+    """(label, marker, zoom, generated) for each rerun of a typical session"""
+    marker, moved = tuple(CENTER), (CENTER[0] + 0.004, CENTER[1] - 0.003)
+    steps = [("style", marker, 14, False)] * 8
+    steps += [("marker move", moved, 14, False)] + [("style", moved, 14, False)] * 4
+    steps += [("generate", moved, 14, True)] + [("style", moved, 14, True)] * 8
+    steps += [("zoom", moved, 15, True)] + [("style", moved, 15, True)] * 4
+    return steps
+
+
+def old_rerun(marker, zoom, network):
+    m = base_map(CENTER, zoom)
+    folium.Marker(location=list(marker), draggable=False, tooltip="Click the map to move me").add_to(m)
+    streamlit_folium.st_folium(m, height=780, width=None, key="folium_map")
+
+
+def new_rerun(state, marker, zoom, network):
+    first_render = "base_map" not in state
+    if first_render:
+        state["base_map"] = base_map(CENTER, 14)
+    if state.get("marker", (None,))[0] != marker:
+        state["marker"] = (marker, marker_layer(*marker))
+    layers = [state["marker"][1]]
+    if network is not None:
+        if state.get("overlay", (None,))[0] != zoom:
+            state["overlay"] = (zoom, overlay_layer(*network, zoom, "A3 (29.7 x 42 cm)"))
+        layers.append(state["overlay"][1])
+    streamlit_folium.st_folium(state["base_map"], height=780, width=None, key="folium_map", center=list(CENTER),
+                               zoom=zoom, feature_group_to_add=layers, render=first_render)
+    detach_layers(state["base_map"], layers)
+
+
+def replay(rerun, network):
+    """Bytes sent and seconds spent per rerun"""
+    min_cached = config.get_option("global.minCachedMessageSize")
+    sent, results = set(), []
+    for label, marker, zoom, generated in session_steps():
+        captured.clear()
+        start = time.perf_counter()
+        rerun(marker, zoom, network if generated else None)
+        seconds = time.perf_counter() - start
+        payload = json.dumps({k: v for k, v in captured[0].items() if k != "on_change"}, sort_keys=True).encode()
+        digest = hashlib.sha1(payload).hexdigest()
+        cached = len(payload) >= min_cached and digest in sent
+        sent.add(digest)
+        results.append((label, REF_BYTES if cached else len(payload), len(payload), seconds))
+    return results
+
+
+def main():
+    G = city_graph(CENTER[0], CENTER[1], 0.015)
+    geometry = EdgeGeometry.from_graph(G)
+    lengths, _, _, primary = extract_graph_edges(G)
+    classes = road_classes(lengths, primary)
+    style = preset_style("Bold")
+    network = (geometry, classes, style)
+
+    naive = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "LineString", "coordinates": segment.tolist()}, "properties": {}}
+        for segment in geometry.segments()]}
+    print(f"road overlay: every edge at full precision {len(json.dumps(naive)) / 1024:.0f} KB, "
+          f"decimated for zoom 14 {len(json.dumps(overlay_geojson(geometry, classes, style, 14))) / 1024:.0f} KB")
+
+    old = replay(old_rerun, None)
+    state = {}
+    new = replay(lambda marker, zoom, net: new_rerun(state, marker, zoom, net), network)
+
+    print(f"{'rerun':<12} {'old sent':>10} {'old ms':>8} {'new sent':>10} {'new payload':>12} {'new ms':>8}")
+    for (label, old_sent, _, old_s), (_, new_sent, new_payload, new_s) in zip(old, new):
+        print(f"{label:<12} {old_sent / 1024:>8.1f}KB {old_s * 1000:>8.1f} {new_sent / 1024:>8.1f}KB "
+              f"{new_payload / 1024:>10.1f}KB {new_s * 1000:>8.1f}")
+    generated = [step[3] for step in session_steps()]
+    for phase, after in (("before Generate", False), ("after Generate", True)):
+        rows = [(o, n) for o, n, g in zip(old, new, generated) if g == after and o[0] == "style"]
+        print(f"style-only reruns {phase}: old {sum(o[1] for o, _ in rows) / len(rows) / 1024:.1f} KB "
+              f"{sum(o[3] for o, _ in rows) / len(rows) * 1000:.1f} ms, "
+              f"new {sum(n[1] for _, n in rows) / len(rows) / 1024:.1f} KB "
+              f"{sum(n[3] for _, n in rows) / len(rows) * 1000:.1f} ms")
+    print("(the old app had no road overlay; after Generate the new one also carries it)")
+    print(f"whole session: old {sum(r[1] for r in old) / 1024:.0f} KB, new {sum(r[1] for r in new) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
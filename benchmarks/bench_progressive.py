@@ -0,0 +1,51 @@
+"""Time to first picture: the decimated screen-resolution preview against the full render it stands in for
+
+    python benchmarks/bench_progressive.py [--half-size DEG]
+
+Runs render_preview the way a Generate click does (network already built) and reports, from the start of the job,
+when the quick preview and the full-resolution PNG become available.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from map_art_app.jobs import RenderJob
+from map_art_app.network import RoadNetwork
+from map_art_app.pipeline import DECIMATED, QUICK_DPI, MapRenderer, render_preview
+from map_art_app.presets import preset_style
+from synthetic import city_graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--half-size", type=float, default=0.05, help="half width of the synthetic city in degrees")
+    args = parser.parse_args()
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    G = city_graph(42.3579, -71.0604, args.half_size)
+    print(f"{G.number_of_edges():,} edges")
+    network = RoadNetwork.from_graph(G)
+    source = ("bbox", args.half_size)
+    job = RenderJob((source, None))
+    png, (geometry, *_) = render_preview(source, preset_style("Bold"), MapRenderer(), lambda source: network,
+                                           job.set_stage, job.set_preview)
+    job.timings["full"] = time.perf_counter() - job.started
+    small, _ = DECIMATED.get((source, QUICK_DPI), lambda: None)
+
+    t = job.timings
+    print(f"preview network: {len(small):,} of {len(geometry):,} edges, {len(small.vertices):,} of "
+          f"{len(geometry.vertices):,} vertices")
+    print(f"network ready    {t['previewing']:6.2f} s")
+    print(f"quick preview    {t['preview']:6.2f} s   ({t['preview'] - t['previewing']:.2f} s, "
+          f"{len(job.preview) / 1024:.0f} KB at {QUICK_DPI} dpi)")
+    print(f"full render      {t['full']:6.2f} s   ({t['full'] - t['drawing']:.2f} s, {len(png) / 1024:.0f} KB)")
+    print(f"first picture {t['full'] / t['preview']:.1f}x sooner")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Time ox.plot_graph against the LineCollection renderer on a ~200k-edge graph
+
+    python benchmarks/bench_render.py [--half-size DEG]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import osmnx as ox
+
+from map_art_app.render import EdgeGeometry, plot_graph, restyle_graph
+from map_art_app.roads import classify_road_segments, extract_graph_edges, road_classes
+from synthetic import city_graph
+
+COLORS = {"<100": "#d40a47", "100-200": "#e78119", "200-400": "#30bab0",
+          "400-800": "#bbbbbb", ">800": "#ffffff", "primary": "#ffffff"}
+WIDTHS = {"<100": 0.3, "100-200": 0.45, "200-400": 0.6, "400-800": 0.75, ">800": 0.5, "primary": 0.8}
+MIDNIGHT = {"<100": "#5dd39e", "100-200": "#348aa7", "200-400": "#525174",
+            "400-800": "#513b56", ">800": "#6c8ead", "primary": "#ffffff"}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def png_bytes(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=300)
+    return len(buf.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--half-size", type=float, default=0.09, help="half width of the synthetic city in degrees")
+    args = parser.parse_args()
+
+    G = city_graph(42.3579, -71.0604, args.half_size)
+    edges = extract_graph_edges(G)
+    road_colors, road_widths = classify_road_segments(edges, COLORS, WIDTHS)
+    print(f"{G.number_of_edges():,} edges")
+
+    t_ox, (fig_ox, _) = timed(lambda: ox.plot_graph(
+        G, node_size=0, dpi=300, bgcolor="#31bab0", edge_color=list(road_colors),
+        edge_linewidth=road_widths.tolist(), edge_alpha=1, show=False))
+    t_ox_png, _ = timed(lambda: png_bytes(fig_ox))
+    plt.close(fig_ox)
+
+    t_geometry, geometry = timed(lambda: EdgeGeometry.from_graph(G))
+    t_segments, _ = timed(geometry.segments)
+    classes = road_classes(edges[0], edges[3])
+    t_plot, (fig, ax) = timed(lambda: plot_graph(geometry, classes, COLORS, WIDTHS, "#31bab0"))
+    t_png, _ = timed(lambda: png_bytes(fig))
+    t_restyle, _ = timed(lambda: restyle_graph(fig, ax, MIDNIGHT, WIDTHS, "#061529"))
+
+    print(f"ox.plot_graph             {t_ox:7.2f} s   + 300 dpi PNG {t_ox_png:6.2f} s")
+    print(f"geometry buffers (once)   {t_geometry + t_segments:7.2f} s")
+    print(f"LineCollection plot_graph {t_plot:7.2f} s   + 300 dpi PNG {t_png:6.2f} s")
+    print(f"restyle                   {t_restyle:7.3f} s")
+    print(f"figure build speedup {t_ox / t_plot:.1f}x, "
+          f"build + PNG speedup {(t_ox + t_ox_png) / (t_plot + t_png):.1f}x")
+    assert t_ox / t_plot >= 5, "LineCollection renderer should build the figure at least 5x faster"
+
+
+if __name__ == "__main__":
+    main()
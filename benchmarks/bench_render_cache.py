@@ -0,0 +1,69 @@
+"""Export downloads through the render cache: what a rerun costs without a click, and a click on a miss vs. a hit
+
+    python benchmarks/bench_render_cache.py
+
+The app builds its download button on every rerun (every slider move), so RenderCache.download must neither read
+the cached export nor count a hit or miss until the button is clicked; this is asserted, as is a second click being
+served from the cache without rendering.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_export import COLORS, WIDTHS
+from map_art_app.network import RoadNetwork
+from map_art_app.pipeline import freeze_style
+from map_art_app.render_cache import RenderCache, network_fingerprint
+from map_art_app.vector import vector_download
+from synthetic import city_graph
+
+RERUNS = 50
+
+
+def main():
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+    network = RoadNetwork.from_graph(city_graph(42.3579, -71.0604, 0.02))
+    style = freeze_style(COLORS, WIDTHS, "#31bab0", True)
+    key = RenderCache.key(network_fingerprint(network, network.classes), style, "pdf", size="8 x 8 in", dpi=300)
+    renders = []
+
+    def render():
+        renders.append(1)
+        return vector_download(network, network.classes, style, "8 x 8 in", "pdf")()
+
+    with tempfile.TemporaryDirectory() as root:
+        cache = RenderCache(root)
+        reads = []
+        lookup = cache.cache.get
+        cache.cache.get = lambda k: reads.append(k) or lookup(k)
+
+        def reruns():
+            start = time.perf_counter()
+            for _ in range(RERUNS):
+                button_data = cache.download(key, render)
+            return button_data, (time.perf_counter() - start) / RERUNS
+
+        button_data, seconds = reruns()
+        assert not reads and cache.hits == cache.misses == 0, "a rerun without a click must not touch the cache"
+        print(f"rerun, no click:     {seconds * 1e6:.1f} us, no reads, no hits or misses")
+
+        start = time.perf_counter()
+        size = len(button_data().getvalue())
+        print(f"click, cache miss:   {time.perf_counter() - start:.3f}s ({size} bytes rendered)")
+        assert (len(renders), cache.hits, cache.misses) == (1, 0, 1)
+
+        button_data, seconds = reruns()
+        assert len(reads) == 1 and (cache.hits, cache.misses) == (0, 1), "reruns after the click must not read"
+        start = time.perf_counter()
+        assert len(button_data().getvalue()) == size
+        print(f"click, cache hit:    {time.perf_counter() - start:.3f}s")
+        assert (len(renders), cache.hits, cache.misses) == (1, 1, 1), "a second click must be served from the cache"
+
+
+if __name__ == "__main__":
+    main()
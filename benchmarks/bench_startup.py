@@ -0,0 +1,79 @@
+"""Time to first interactive page of the Streamlit app from a cold process
+
+    python benchmarks/bench_startup.py [--runs 5] [--app path/to/map_art_app/app.py]
+
+Each run is a fresh interpreter that imports Streamlit's AppTest and runs app.py once, the way a new worker serves
+its first page. Reported are the whole process wall time and the first script run alone (which is where the app's
+own imports land), plus which heavy modules were loaded: once the page is out the app's background warm-up (if it
+has one) imports the render path's dependencies, so the bench waits for that thread and reports how long it took.
+Modules listed at first page may include some the warm-up had already started importing by then.
+Point --app at another checkout's app.py to compare before and after.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_APP = os.path.join(os.path.dirname(HERE), "map_art_app", "app.py")
+HEAVY = ["osmnx", "geopandas", "pandas", "networkx", "matplotlib", "folium"]
+
+CHILD = """
+import json, sys, threading, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+seconds = time.perf_counter() - start
+assert not at.exception, at.exception
+page = [m for m in sys.argv[2:] if m in sys.modules]
+warm_up = None
+for thread in threading.enumerate():
+    if thread.name == "map-warm-up":
+        thread.join()
+        warm_up = time.perf_counter() - start - seconds
+print(json.dumps({"first_run": seconds, "page": page, "warm_up": warm_up,
+                  "loaded": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--app", default=DEFAULT_APP, help="app.py to start")
+    args = parser.parse_args()
+
+    totals, first_runs, warm_ups = [], [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Empty caches, nothing to warm: only imports and the first page are measured
+        env = dict(os.environ, MAP_ART_GRAPH_STORE=os.path.join(tmp, "graphs"),
+                   MAP_ART_RENDER_CACHE=os.path.join(tmp, "renders"),
+                   MAP_ART_GEOCODE_CACHE=os.path.join(tmp, "geocode.sqlite"))
+        env.pop("MAP_ART_WARMUP_PLACES", None)
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", CHILD, os.path.abspath(args.app), *HEAVY], env=env,
+                                 capture_output=True, text=True)
+            if out.returncode:
+                sys.exit(out.stderr)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            # The page was out before the warm-up was waited for
+            totals.append(time.perf_counter() - start - (result["warm_up"] or 0))
+            first_runs.append(result["first_run"])
+            if result["warm_up"] is not None:
+                warm_ups.append(result["warm_up"])
+
+    print(f"{args.app}")
+    print(f"process start to first page  median {statistics.median(totals):.2f}s  min {min(totals):.2f}s")
+    print(f"first script run             median {statistics.median(first_runs):.2f}s  min {min(first_runs):.2f}s")
+    if warm_ups:
+        print(f"background warm-up after it  median {statistics.median(warm_ups):.2f}s")
+    print(f"heavy modules at first page  {', '.join(result['page']) or 'none'}")
+    print(f"heavy modules after warm-up  {', '.join(result['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
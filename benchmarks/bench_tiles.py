@@ -0,0 +1,80 @@
+"""Count network fetches for a scripted pan/zoom sequence: one fetch per bbox vs. the tiled graph cache
+
+    python benchmarks/bench_tiles.py
+
+Every assembled graph is also checked against a single fetch of the same area run through osmnx's own
+graph_from_polygon steps: the edge lengths must match, border streets included.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import osmnx as ox
+
+from map_art_app.graph_store import GraphStore
+from map_art_app.tiles import TiledGraphCache, buffer_polygon
+from synthetic import lattice_graph
+
+
+def pan_sequence(lat=42.3579, lon=-71.0604, steps=12):
+    """Marker drifting east then north, with the bbox slider nudged part way through"""
+    bboxes = []
+    size = 0.015
+    for step in range(steps):
+        if step == steps // 2:
+            size = 0.02
+        dlon = 0.004 * min(step, steps // 2)
+        dlat = 0.004 * max(0, step - steps // 2)
+        bboxes.append((lon + dlon - size, lat + dlat - size, lon + dlon + size, lat + dlat + size))
+    return bboxes
+
+
+def single_fetch(bbox):
+    """What one ox.graph.graph_from_bbox call makes of the same data: download the buffered polygon, simplify, then
+    truncate to the bbox"""
+    polygon = ox.utils_geo.bbox_to_poly(bbox)
+    buffered = buffer_polygon(polygon)
+    G_buff = ox.truncate.truncate_graph_polygon(lattice_graph(buffered.bounds), buffered)
+    G_buff = ox.simplify_graph(ox.truncate.largest_component(G_buff))
+    return ox.truncate.largest_component(ox.truncate.truncate_graph_polygon(G_buff, polygon))
+
+
+def edge_lengths(G):
+    return sorted(round(length, 3) for _, _, length in G.edges(data="length"))
+
+
+def main():
+    bboxes = pan_sequence()
+
+    naive_area = sum((b[2] - b[0]) * (b[3] - b[1]) for b in bboxes)
+    print(f"per-bbox fetching: {len(bboxes)} fetches covering {naive_area:.4f} deg^2")
+
+    fetched = []
+
+    def fetch(bbox, network_type):
+        fetched.append((bbox[2] - bbox[0]) * (bbox[3] - bbox[1]))
+        return lattice_graph(bbox, network_type)
+
+    with tempfile.TemporaryDirectory() as root:
+        tiles = TiledGraphCache(GraphStore(root=root, offline=False), fetch=fetch)
+        start = time.perf_counter()
+        graphs = [tiles.graph_from_bbox(bbox) for bbox in bboxes]
+        elapsed = time.perf_counter() - start
+        G = graphs[-1]
+        tile_area = sum(fetched)
+        print(f"tiled cache:       {tiles.fetches} fetches covering {tile_area:.4f} deg^2 "
+              f"({elapsed:.2f}s assembling {len(bboxes)} graphs, last has {len(G.edges)} edges)")
+
+    assert tiles.fetches < len(bboxes), "tiled cache should need fewer fetches than one per bbox"
+    assert tile_area < naive_area, "tiled cache should download less area than per-bbox fetches"
+    for bbox, G in zip(bboxes, graphs):
+        assert edge_lengths(G) == edge_lengths(single_fetch(bbox)), f"tiled graph for {bbox} differs from one fetch"
+    print(f"all {len(bboxes)} tiled graphs match a single fetch of their area")
+
+
+if __name__ == "__main__":
+    main()
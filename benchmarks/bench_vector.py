@@ -0,0 +1,76 @@
+"""Compare simplified SVG/PDF export with a plain savefig of the figure, in file size and write time
+
+    python benchmarks/bench_vector.py [--half-size DEG] [--size NAME]
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from map_art_app.export import CM_PER_INCH, PRINT_SIZES
+from map_art_app.pipeline import freeze_style
+from map_art_app.render import EdgeGeometry, add_legend, plot_graph
+from map_art_app.roads import extract_graph_edges, road_classes
+from map_art_app.vector import export_pdf, export_svg
+from synthetic import city_graph
+
+COLORS = {"<100": "#d40a47", "100-200": "#e78119", "200-400": "#30bab0",
+          "400-800": "#bbbbbb", ">800": "#ffffff", "primary": "#ffffff"}
+WIDTHS = {"<100": 0.3, "100-200": 0.45, "200-400": 0.6, "400-800": 0.75, ">800": 0.5, "primary": 0.8}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def naive(geometry, classes, fmt, width_cm, height_cm):
+    fig, ax = plot_graph(geometry, classes, COLORS, WIDTHS, "#31bab0",
+                         figsize=(width_cm / CM_PER_INCH, height_cm / CM_PER_INCH))
+    add_legend(ax, COLORS)
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt)
+    return len(buf.getvalue())
+
+
+def streamed(geometry, classes, style, fmt, width_cm, height_cm):
+    if fmt == "svg":
+        buf = io.StringIO()
+        export_svg(buf, geometry, classes, style, width_cm, height_cm)
+        return len(buf.getvalue().encode())
+    buf = io.BytesIO()
+    export_pdf(buf, geometry, classes, style, width_cm, height_cm)
+    return len(buf.getvalue())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--half-size", type=float, default=0.04, help="half width of the synthetic city in degrees")
+    parser.add_argument("--size", default="24 x 36 in", choices=list(PRINT_SIZES))
+    args = parser.parse_args()
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    G = city_graph(42.3579, -71.0604, args.half_size)
+    geometry = EdgeGeometry.from_graph(G)
+    lengths, _, _, primary = extract_graph_edges(G)
+    classes = road_classes(lengths, primary)
+    style = freeze_style(COLORS, WIDTHS, "#31bab0", True)
+    width_cm, height_cm = PRINT_SIZES[args.size]
+    print(f"{len(geometry):,} edges, {len(geometry.vertices):,} vertices, {args.size} at 300 dpi")
+
+    for fmt in ("svg", "pdf"):
+        t_naive, size_naive = timed(lambda: naive(geometry, classes, fmt, width_cm, height_cm))
+        t_ours, size_ours = timed(lambda: streamed(geometry, classes, style, fmt, width_cm, height_cm))
+        print(f"{fmt}  savefig {size_naive / 1024 ** 2:7.2f} MB {t_naive:6.2f} s   "
+              f"simplified {size_ours / 1024 ** 2:7.2f} MB {t_ours:6.2f} s   "
+              f"({size_naive / size_ours:.1f}x smaller, {t_naive / t_ours:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
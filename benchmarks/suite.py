@@ -0,0 +1,234 @@
+"""Benchmark suite: every pipeline stage on three fixture graphs, compared with a saved baseline
+
+    python benchmarks/suite.py [--fixtures neighborhood downtown city] [--dpi 150 300 600] [--repeat 3]
+                               [--baseline benchmarks/baseline.json] [--save-baseline] [--require-baseline]
+                               [--json results.json]
+
+Fixtures are graphs in the graph store's format (graph_store.save_graph) under benchmarks/fixtures/. Missing ones
+are generated from seeded synthetic cities (see synthetic.city_graph) of increasing size, so the suite never needs
+the network; a real OSM extract saved under the same name is used as-is instead. Each fixture goes through:
+
+    load        load_graph, what a graph store hit costs
+    network     RoadNetwork.from_graph: edge extraction and road classification
+    draw        plot_graph plus the legend, the on-screen figure
+    encode      savefig of that figure at the preview dpi
+    png@DPI     strip-streamed export_png of an 8 x 8 in print
+    pdf         export_pdf of the same print at 300 dpi
+    e2e@DPI     load + network + png export, the whole headless render
+
+Seconds are the fastest of --repeat runs; peak is how far the RSS high-water mark rose above the RSS at the start of
+the stage (Linux /proc, as in bench_export.py), the largest over the runs. With --save-baseline the results become
+the baseline; otherwise they are compared with it and any stage more than --time-tolerance slower or
+--memory-tolerance bigger than its baseline fails the run with exit status 1. Baselines are only comparable on the
+machine that recorded them and on the same fixtures, which is checked through the fixtures' content digests, so none
+is shipped: record one on the machine that runs the suite. Without a baseline the run only reports, unless
+--require-baseline (for CI) makes that a failure too.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import platform
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import matplotlib
+import numpy as np
+
+from bench_export import COLORS, WIDTHS, CountingSink, peak_rss_delta
+from map_art_app.export import PRINT_SIZES, export_png, print_size_pixels
+from map_art_app.graph_store import load_graph, save_graph
+from map_art_app.network import RoadNetwork
+from map_art_app.pipeline import PREVIEW_DPI, freeze_style
+from map_art_app.render import add_legend, plot_graph
+from map_art_app.vector import export_pdf
+from synthetic import city_graph
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(HERE, "fixtures")
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+# Half width in degrees of each synthetic fixture, around the same center, smallest first
+FIXTURES = {"neighborhood": 0.01, "downtown": 0.03, "city": 0.08}
+CENTER = (42.3579, -71.0604)
+PRINT_SIZE = "8 x 8 in"
+# Differences below these are noise whatever the tolerance says
+MIN_SECONDS = 0.05
+MIN_PEAK_MB = 8
+
+
+def fixture_path(name, fixture_dir=FIXTURE_DIR):
+    """Path of a fixture graph, generated and saved the first time it is asked for"""
+    path = os.path.join(fixture_dir, f"{name}.npz")
+    if not os.path.exists(path):
+        os.makedirs(fixture_dir, exist_ok=True)
+        print(f"generating fixture {name} ...", flush=True)
+        G = city_graph(*CENTER, FIXTURES[name])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            save_graph(G, f)
+        os.replace(tmp_path, path)
+    return path
+
+
+def fixture_digest(path):
+    """Digest of a fixture's arrays (the zip container itself carries timestamps)"""
+    digest = hashlib.sha1()
+    with np.load(path, allow_pickle=False) as z:
+        for name in sorted(z.files):
+            digest.update(name.encode())
+            digest.update(z[name].tobytes())
+    return digest.hexdigest()[:16]
+
+
+def draw(network, style):
+    fig, ax = plot_graph(network, network.classes, COLORS, WIDTHS, style[2])
+    add_legend(ax, COLORS)
+    return fig
+
+
+def encode(fig):
+    sink = CountingSink()
+    fig.savefig(sink, format="png", bbox_inches="tight", dpi=PREVIEW_DPI)
+    return sink.size
+
+
+def png(network, style, dpi):
+    sink = CountingSink()
+    export_png(sink, network, network.classes, style, *print_size_pixels(*PRINT_SIZES[PRINT_SIZE], dpi), dpi=dpi)
+    return sink.size
+
+
+def pdf(network, style):
+    sink = CountingSink()
+    export_pdf(sink, network, network.classes, style, *PRINT_SIZES[PRINT_SIZE], 300)
+    return sink.size
+
+
+def end_to_end(path, style, dpi):
+    return png(RoadNetwork.from_graph(load_graph(path)), style, dpi)
+
+
+def measure(fn, repeat):
+    """(fastest seconds, largest peak MB, result of the last run)"""
+    runs = [peak_rss_delta(fn) for _ in range(repeat)]
+    return min(r[0] for r in runs), max(r[2] for r in runs), runs[-1][1]
+
+
+def run_fixture(name, path, dpis, repeat, report):
+    style = freeze_style(COLORS, WIDTHS, "#31bab0", True)
+    seconds, peak, G = measure(lambda: load_graph(path), repeat)
+    report(f"{name}/load", seconds, peak, edges=G.number_of_edges())
+    seconds, peak, network = measure(lambda: RoadNetwork.from_graph(G), repeat)
+    del G
+    report(f"{name}/network", seconds, peak)
+    seconds, peak, fig = measure(lambda: draw(network, style), repeat)
+    report(f"{name}/draw", seconds, peak)
+    seconds, peak, size = measure(lambda: encode(fig), repeat)
+    del fig
+    report(f"{name}/encode", seconds, peak, bytes=size)
+    for dpi in dpis:
+        seconds, peak, size = measure(lambda: png(network, style, dpi), repeat)
+        report(f"{name}/png@{dpi}", seconds, peak, bytes=size)
+    seconds, peak, size = measure(lambda: pdf(network, style), repeat)
+    report(f"{name}/pdf", seconds, peak, bytes=size)
+    del network
+    for dpi in dpis:
+        seconds, peak, size = measure(lambda: end_to_end(path, style, dpi), repeat)
+        report(f"{name}/e2e@{dpi}", seconds, peak, bytes=size)
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "matplotlib": matplotlib.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """Regression messages for every stage slower or bigger than its baseline beyond the tolerances"""
+    regressions = []
+    for stage, result in results.items():
+        base = baseline["results"].get(stage)
+        if base is None:
+            continue
+        if (result["seconds"] > base["seconds"] * (1 + time_tolerance)
+                and result["seconds"] - base["seconds"] > MIN_SECONDS):
+            regressions.append(f"{stage}: {result['seconds']:.3f}s vs {base['seconds']:.3f}s baseline "
+                               f"(+{result['seconds'] / base['seconds'] - 1:.0%})")
+        if (result["peak_mb"] > base["peak_mb"] * (1 + memory_tolerance)
+                and result["peak_mb"] - base["peak_mb"] > MIN_PEAK_MB):
+            regressions.append(f"{stage}: peak +{result['peak_mb']:.0f} MB vs +{base['peak_mb']:.0f} MB baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", nargs="+", default=list(FIXTURES), choices=list(FIXTURES))
+    parser.add_argument("--fixture-dir", default=FIXTURE_DIR, help="where fixture graphs are read and generated")
+    parser.add_argument("--dpi", type=int, nargs="+", default=[150, 300, 600], help="export resolutions")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the fastest counts")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="record these results as the baseline")
+    parser.add_argument("--require-baseline", action="store_true", help="fail if there is no baseline to compare with")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--memory-tolerance", type=float, default=0.20, help="allowed peak memory growth")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.require_baseline and baseline is None:
+        # Checked before anything runs, so CI fails fast instead of after the whole suite
+        sys.exit(f"no baseline at {args.baseline}; record one with --save-baseline")
+
+    paths = {name: fixture_path(name, args.fixture_dir) for name in args.fixtures}
+    digests = {name: fixture_digest(path) for name, path in paths.items()}
+    if baseline is not None:
+        changed = [name for name in digests if baseline["fixtures"].get(name, digests[name]) != digests[name]]
+        if changed:
+            sys.exit(f"fixtures {changed} differ from the ones {args.baseline} was recorded on; "
+                     f"re-record it with --save-baseline")
+
+    results = {}
+    print(f"{'stage':<24} {'seconds':>8} {'peak MB':>8} {'baseline':>9} {'change':>7}")
+
+    def report(stage, seconds, peak, **extra):
+        results[stage] = {"seconds": round(seconds, 4), "peak_mb": round(peak, 1), **extra}
+        line = f"{stage:<24} {seconds:>8.3f} {peak:>8.0f}"
+        base = baseline["results"].get(stage) if baseline is not None else None
+        if base is not None:
+            line += f" {base['seconds']:>8.3f}s {seconds / base['seconds'] - 1:>+7.0%}"
+        print(line, flush=True)
+
+    for name, path in paths.items():
+        run_fixture(name, path, args.dpi, args.repeat, report)
+
+    record = {"environment": environment(), "fixtures": digests, "print_size": PRINT_SIZE, "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(record, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(record, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return
+    if baseline is None:
+        print(f"no baseline at {args.baseline}; record one with --save-baseline")
+        return
+    if baseline["environment"] != record["environment"]:
+        print(f"warning: baseline recorded with {baseline['environment']}, now {record['environment']}")
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSIONS against {args.baseline}:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+    print(f"no regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Deterministic OSM-like street lattices so the benchmarks run without network access"""
+import math
+
+import networkx as nx
+import numpy as np
+
+# Lattice spacing in degrees (~90 m blocks)
+SPACING = 0.0008
+HIGHWAYS = ["residential", "residential", "tertiary", "secondary", "primary", "primary_link", "footway"]
+
+
+def _node_id(i, j):
+    return (i + 2 ** 20) * 2 ** 21 + (j + 2 ** 20)
+
+
+def _highway(i, j, horizontal):
+    # Every 8th row/column is a primary artery, the rest is hashed so it is stable across tiles
+    line = i if horizontal else j
+    if line % 8 == 0:
+        return "primary"
+    return HIGHWAYS[(i * 7919 + j * 104729 + horizontal) % len(HIGHWAYS)]
+
+
+def lattice_graph(bbox, network_type="all", spacing=SPACING):
+    """Unsimplified street lattice for a (left, bottom, right, top) bbox, keeping edges that cross the border"""
+    left, bottom, right, top = bbox
+    cols = range(math.floor(left / spacing) - 1, math.ceil(right / spacing) + 2)
+    rows = range(math.floor(bottom / spacing) - 1, math.ceil(top / spacing) + 2)
+
+    def inside(i, j):
+        return left <= j * spacing <= right and bottom <= i * spacing <= top
+
+    G = nx.MultiDiGraph(crs="epsg:4326", simplified=False)
+    for i in rows:
+        for j in cols:
+            for di, dj in ((0, 1), (1, 0)):
+                a, b = (i, j), (i + di, j + dj)
+                if not (inside(*a) or inside(*b)):
+                    continue
+                for n in (a, b):
+                    G.add_node(_node_id(*n), x=n[1] * spacing, y=n[0] * spacing, street_count=4)
+                lat = math.radians(i * spacing)
+                length = spacing * 111320 * (math.cos(lat) if di == 0 else 1.0)
+                data = {"osmid": _node_id(i, j) % 1000003, "highway": _highway(i, j, di == 0),
+                        "oneway": False, "length": length}
+                G.add_edge(_node_id(*a), _node_id(*b), reversed=False, **data)
+                G.add_edge(_node_id(*b), _node_id(*a), reversed=True, **data)
+    return G
+
+
+def city_graph(center_lat, center_lon, half_size, spacing=SPACING, seed=0):
+    """Simplified-looking city graph: a lattice with jittered nodes, curved edges and mixed edge lengths"""
+    from shapely.geometry import LineString
+
+    rng = np.random.default_rng(seed)
+    bbox = (center_lon - half_size, center_lat - half_size, center_lon + half_size, center_lat + half_size)
+    G = lattice_graph(bbox, spacing=spacing)
+    for _, d in G.nodes(data=True):
+        d["x"] += rng.normal(0, spacing / 20)
+        d["y"] += rng.normal(0, spacing / 20)
+    for u, v, k, d in G.edges(keys=True, data=True):
+        if d["reversed"]:
+            continue
+        d["length"] *= float(rng.choice([0.5, 1.5, 3.0, 6.0, 12.0]))
+        if rng.random() < 0.3:
+            xu, yu, xv, yv = G.nodes[u]["x"], G.nodes[u]["y"], G.nodes[v]["x"], G.nodes[v]["y"]
+            bend = rng.normal(0, spacing / 6, size=(3, 2))
+            xs = np.linspace(xu, xv, 5)
+            ys = np.linspace(yu, yv, 5)
+            xs[1:4] += bend[:, 0]
+            ys[1:4] += bend[:, 1]
+            d["geometry"] = LineString(np.column_stack([xs, ys]))
+            back = G.edges[v, u, 0]
+            back["length"] = d["length"]
+            back["geometry"] = LineString(np.column_stack([xs, ys])[::-1])
+    G.graph["simplified"] = True
+    return G
+
+
+def features_frame(bbox, tags, spacing=SPACING):
+    """OSM-like area features for a bbox, shaped like ox.features.features_from_bbox output: four buildings per
+    lattice block, a park every 5th block, residential land use every 3rd, and a lake with an island"""
+    import geopandas as gpd
+    from shapely.geometry import Polygon, box
+
+    left, bottom, right, top = bbox
+    rows, geoms = [], []
+
+    def add(geom, **row):
+        rows.append(row)
+        geoms.append(geom)
+
+    cols = range(math.floor(left / spacing), math.ceil(right / spacing))
+    for i in range(math.floor(bottom / spacing), math.ceil(top / spacing)):
+        for j in cols:
+            x, y = j * spacing, i * spacing
+            if (i * 31 + j * 17) % 5 == 0:
+                add(box(x + spacing * 0.1, y + spacing * 0.1, x + spacing * 0.9, y + spacing * 0.9), leisure="park")
+                continue
+            if (i + j) % 3 == 0:
+                add(box(x, y, x + spacing, y + spacing), landuse="residential")
+            for dx in (0.15, 0.55):
+                for dy in (0.15, 0.55):
+                    add(box(x + spacing * dx, y + spacing * dy, x + spacing * (dx + 0.3), y + spacing * (dy + 0.3)),
+                        building="yes")
+    cx, cy, r = (left + right) / 2, (bottom + top) / 2, (right - left) / 6
+    angles = np.linspace(0, 2 * math.pi, 200, endpoint=False)
+    island = [(cx + r / 4 * math.cos(a), cy + r / 5 * math.sin(a)) for a in angles[::-1]]
+    add(Polygon([(cx + r * math.cos(a), cy + r * 0.7 * math.sin(a)) for a in angles], [island]), natural="water")
+
+    frame = gpd.GeoDataFrame(rows, geometry=geoms, crs="epsg:4326")
+    # Like an Overpass query, only features matching one of the requested tags come back
+    keep = np.zeros(len(frame), dtype=bool)
+    for key, values in tags.items():
+        if key in frame:
+            keep |= (frame[key].notna() if values is True else frame[key].isin(values)).to_numpy()
+    return frame[keep]
@@ -0,0 +1 @@
+"""Streamlit map art generator built on OSMnx street networks."""
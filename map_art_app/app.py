@@ -1,136 +1,207 @@
+import os
+import sys
+
+# `streamlit run map_art_app/app.py` puts only this folder on sys.path; add the repo root so the package imports resolve
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Time-to-first-interactive: osmnx (geopandas, pandas), networkx and matplotlib are only imported once a map is
+# generated or by the warm-up thread, never for the first page
 from streamlit_folium import st_folium
 import streamlit as st
-import osmnx as ox
-import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
-import folium
-from folium import Map
-import io
-from folium import Marker
-import numpy as np
-import time
+import logging
+import threading
+import uuid
+from functools import partial
+from map_art_app.export import PRINT_SIZES, png_download
+from map_art_app.geocode import GeocodeCache, geocode_point
+from map_art_app.graph_store import GraphStore
+from map_art_app.jobs import JobManager
+from map_art_app.pipeline import (DECIMATED, FINGERPRINTS, NETWORKS, MapRenderer, freeze_style, render_preview,
+                                  stage_stats, warm_up)
+from map_art_app.preview import base_map, detach_layers, marker_layer, overlay_layer
+from map_art_app.presets import DEFAULT_BACKGROUND, DEFAULT_COLORS, DEFAULT_WIDTHS, apply_style_preset
+from map_art_app.layers import LAYERS, LayerCache
+from map_art_app.metrics import METRICS
+from map_art_app.render_cache import RenderCache
+from map_art_app.vector import vector_download
+
+LOG = logging.getLogger("map_art_app.app")
 
 # Set page to wide mode by default
 st.set_page_config(layout="wide")
 
-@st.cache_data
-def get_graph(place=None, bbox=None):
-    """Get graph either from a place name or a bounding box"""
-    if place:
+@st.cache_resource
+def configure_osmnx():
+    """osmnx settings, applied when the first thing that can reach OpenStreetMap is created"""
+    import osmnx as ox
+    ox.settings.requests_kwargs = {'verify': False}
+
+@st.cache_resource
+def get_graph_store():
+    """One on-disk graph store per process; workers share it through MAP_ART_GRAPH_STORE"""
+    configure_osmnx()
+    return GraphStore()
+
+@st.cache_resource
+def get_tile_cache():
+    """Tiled view over the graph store so panning only fetches newly exposed tiles"""
+    from map_art_app.tiles import TiledGraphCache
+    return TiledGraphCache(get_graph_store())
+
+@st.cache_resource
+def get_layer_cache():
+    """Area layers per bbox in the graph store; layers a map is missing are fetched in one query"""
+    return LayerCache(get_graph_store())
+
+@st.cache_resource
+def get_render_cache():
+    """Finished maps and exports on disk, shared by every session and worker; see MAP_ART_RENDER_CACHE"""
+    return RenderCache()
+
+@st.cache_resource
+def get_metrics():
+    """Process-wide metrics, with every shared cache's hit/miss counters attached; see MAP_ART_METRICS_FILE"""
+    for stage in (NETWORKS, DECIMATED, FINGERPRINTS):
+        METRICS.add_collector(stage.name, stage.stats)
+    METRICS.add_collector("render", get_render_cache().stats)
+    METRICS.add_collector("geocode", get_geocode_cache().stats)
+    METRICS.add_collector("layers", get_layer_cache().stats)
+    METRICS.add_collector("tiles", lambda: {"fetches": get_tile_cache().fetches})
+    return METRICS
+
+@st.cache_resource
+def get_job_manager():
+    """One render pool per process, so concurrent sessions share workers and identical in-flight maps"""
+    return JobManager()
+
+def get_graph(source, store, tile_cache):
+    """Get graph either from a place name or a bounding box; runs on a render worker, so errors are raised"""
+    kind, value = source
+    if kind == "place":
+        return store.graph_from_place(value)
+    north, south, east, west = value
+    return tile_cache.graph_from_bbox((west, south, east, north))
+
+def get_network(source, store, tile_cache):
+    """Compact RoadNetwork for a source, mapped from the graph store; the graph is only loaded to build it once"""
+    kind, value = source
+    if kind == "bbox":
+        # Keyed on (left, bottom, right, top) like the batch renderer, so both share the stored network
+        north, south, east, west = value
+        value = (west, south, east, north)
+    return store.network(store.source_key((kind, value)), lambda: get_graph(source, store, tile_cache))
+
+def run_render(job, source, style, layer_style, renderer, fetch):
+    """Body of a render job: the map, plus its sizes in job.info for the metrics"""
+    result = render_preview(source, style, renderer, fetch, job.set_stage, job.set_preview, get_render_cache(),
+                            layer_style, get_layer_cache().layers)
+    job.info["source"] = source
+    if result is not None:
+        png, (geometry, _, _, _, layers) = result
+        job.info.update(edges=len(geometry), vertices=len(geometry.vertices),
+                        polygons=sum(len(layer) for _, layer, _ in layers), png_bytes=len(png),
+                        render_cache="miss" if "drawing" in job.timings else "hit")
+    return result
+
+def measured_export(render, fmt, print_size):
+    """Download callable that records the export's time, memory delta and output bytes in the metrics"""
+    def run():
+        with get_metrics().stage("export", format=fmt) as fields:
+            out = render()
+            size = len(out.encode()) if isinstance(out, str) else out.getbuffer().nbytes
+            fields.update(print_size=print_size, bytes=size)
+        get_metrics().observe("export_bytes", size, format=fmt)
+        return out
+    return run
+
+def preview_layers(marker_pos, zoom):
+    """Marker and road-preview feature groups for st_folium, rebuilt only when what they show changes"""
+    marker_key = (marker_pos["lat"], marker_pos["lng"])
+    if st.session_state.get("marker_layer", (None,))[0] != marker_key:
+        st.session_state.marker_layer = (marker_key, marker_layer(*marker_key))
+    layers = [st.session_state.marker_layer[1]]
+
+    if "export_args" in st.session_state:
+        geometry, classes, style, _, _ = st.session_state.export_args
+        # Decimated for the current zoom, framed for the print size picked below the map
+        overlay_key = (id(geometry), style, round(zoom), st.session_state.get("print_size"))
+        if st.session_state.get("overlay_layer", (None,))[0] != overlay_key:
+            st.session_state.overlay_layer = (overlay_key, overlay_layer(geometry, classes, style, *overlay_key[2:]))
+        layers.append(st.session_state.overlay_layer[1])
+    return layers
+
+@st.fragment(run_every=0.5)
+def show_job_progress():
+    """Poll this session's background render without rerunning, or blocking, the rest of the page"""
+    job = get_job_manager().get(st.session_state.get("job_id"))
+    if job is None:
+        del st.session_state["job_id"]
+        st.rerun()
+    if not job.done.is_set():
+        st.progress(job.progress, text=f"Generating map: {job.stage}...")
+        if job.preview is not None:
+            # Quick screen-resolution render, replaced by the full one when it is ready
+            st.image(job.preview, width="stretch")
+            st.caption(f"Preview ready in {job.timings['preview']:.1f}s, full resolution on its way...")
+        return
+    del st.session_state["job_id"]
+    if job.status == "failed":
+        st.session_state["job_error"] = f"Error fetching map data: {job.error}"
+    elif job.status == "done" and job.result is None:
+        st.session_state["job_error"] = "No road data found. Try adjusting your input."
+    elif job.status == "done":
+        st.session_state.map_png, st.session_state.export_args = job.result
+        st.session_state.render_timings = job.timings
+    st.rerun()
+
+@st.cache_resource
+def get_geocode_cache():
+    """Place lookups persist across reruns, sessions and restarts; see MAP_ART_GEOCODE_CACHE"""
+    return GeocodeCache(geocode=lookup_place)
+
+def lookup_place(query):
+    """Nominatim lookup behind the geocode cache; osmnx is only imported on the first query it cannot answer"""
+    configure_osmnx()
+    return geocode_point(query)
+
+@st.cache_resource
+def start_warm_up():
+    """Once per process, after the first page: preload the render path's imports and the stored networks of the
+    places listed one per line in MAP_ART_WARMUP_PLACES, on a background thread"""
+    path = os.environ.get("MAP_ART_WARMUP_PLACES")
+    places = []
+    if path:
         try:
-            return ox.graph.graph_from_place(place, network_type="all")
-        except Exception as e:
-            st.error(f"Error fetching place: {e}")
-            return None
-    elif bbox:
-        left, bottom, right, top = bbox[3], bbox[1], bbox[2], bbox[0]
-        return ox.graph.graph_from_bbox((left, bottom, right, top), network_type="all")
-    return None
+            with open(os.path.expanduser(path)) as f:
+                places = [line.strip() for line in f if line.strip()]
+        except OSError as e:
+            # Warm-up is optional: a bad path must never take the page down with it
+            LOG.warning("skipping warm-up, cannot read MAP_ART_WARMUP_PLACES: %s", e)
+            return {"places": [], "warmed": None, "error": str(e)}
+    status = {"places": places, "warmed": None}
+
+    def run():
+        with METRICS.stage("warm_up") as fields:
+            status["warmed"] = warm_up(get_graph_store(), places)
+            fields.update(places=len(places), warmed=len(status["warmed"]))
+
+    threading.Thread(target=run, name="map-warm-up", daemon=True).start()
+    return status
 
 def get_place_coordinates(place, focus_downtown=True):
     """Get coordinates for a place name, focusing on downtown if requested"""
     try:
-        # If focus_downtown is True, add 'downtown' to the search query
-        search_query = f"downtown {place}" if focus_downtown else place
-        
-        # Get the geocoded place
-        gdf = ox.geocode_to_gdf(search_query)
-        
-        if gdf.empty:
-            # If downtown search fails, try without downtown
-            if focus_downtown:
-                st.warning(f"Could not find downtown for '{place}'. Trying general location instead.")
-                return get_place_coordinates(place, focus_downtown=False)
-            return None
-            
-        # Get the centroid of the geometry
-        centroid = gdf.geometry.iloc[0].centroid
-        return centroid.y, centroid.x
+        # Cached as one entry: the downtown lookup and, if that finds nothing, the general location
+        result = get_geocode_cache().resolve(place, focus_downtown=focus_downtown)
     except Exception as e:
-        if focus_downtown:
-            st.warning(f"Error finding downtown for '{place}'. Trying general location instead.")
-            return get_place_coordinates(place, focus_downtown=False)
         st.error(f"Error geocoding location: {e}")
         return None
-
-def extract_graph_edges(G):
-    u, v, key, data = zip(*G.edges(keys=True, data=True))
-    return list(u), list(v), list(key), list(data)
-
-def classify_road_segments(data, custom_colors, custom_widths):
-    road_colors = []
-    road_widths = []
-
-    for item in data:
-        if "length" in item:
-            if item["length"] <= 100:
-                linewidth, color = custom_widths["<100"], custom_colors["<100"]
-            elif item["length"] <= 200:
-                linewidth, color = custom_widths["100-200"], custom_colors["100-200"]
-            elif item["length"] <= 400:
-                linewidth, color = custom_widths["200-400"], custom_colors["200-400"]
-            elif item["length"] <= 800:
-                linewidth, color = custom_widths["400-800"], custom_colors["400-800"]
-            else:
-                linewidth, color = custom_widths[">800"], custom_colors[">800"]
-
-            if "primary" in item.get("highway", ""):
-                linewidth, color = custom_widths["primary"], custom_colors["primary"]
-        else:
-            linewidth, color = custom_widths[">800"], custom_colors[">800"]
-
-        road_colors.append(color)
-        road_widths.append(linewidth)
-
-    return road_colors, road_widths
-
-def plot_graph(G, road_colors, road_widths, background_color):
-    fig, ax = ox.plot_graph(G, node_size=0, dpi=300, bgcolor=background_color,
-                            edge_color=road_colors, edge_linewidth=road_widths, edge_alpha=1, show=False)
-    return fig, ax
-
-def add_legend(ax, custom_colors, markersize=16, fontsize=16):
-    legend_elements = [
-        Line2D([0], [0], marker='s', color="#061529", label='Length < 100 m',
-               markerfacecolor=custom_colors["<100"], markersize=markersize),
-        Line2D([0], [0], marker='s', color="#061529", label='100-200 m',
-               markerfacecolor=custom_colors["100-200"], markersize=markersize),
-        Line2D([0], [0], marker='s', color="#061529", label='200-400 m',
-               markerfacecolor=custom_colors["200-400"], markersize=markersize),
-        Line2D([0], [0], marker='s', color="#061529", label='400-800 m',
-               markerfacecolor=custom_colors["400-800"], markersize=markersize),
-        Line2D([0], [0], marker='s', color="#061529", label='> 800 m',
-               markerfacecolor=custom_colors[">800"], markersize=markersize),
-        Line2D([0], [0], marker='s', color="#061529", label='Primary',
-               markerfacecolor=custom_colors["primary"], markersize=markersize),
-    ]
-
-    legend = ax.legend(handles=legend_elements, bbox_to_anchor=(0.0, 0.0), frameon=True, ncol=1,
-                       facecolor='#061529', framealpha=0.9, loc='lower left', fontsize=fontsize,
-                       prop={'family': "Georgia", 'size': fontsize})
-
-    for text in legend.get_texts():
-        text.set_color("w")
-
-def apply_style_preset(preset):
-    presets = {
-        "Minimal": {
-            "colors": {"<100": "#cccccc", "100-200": "#bbbbbb", "200-400": "#999999",
-                       "400-800": "#777777", ">800": "#555555", "primary": "#000000"},
-            "background": "#ffffff"
-        },
-        "Bold": {
-            "colors": {"<100": "#d40a47", "100-200": "#e78119", "200-400": "#30bab0",
-                       "400-800": "#bbbbbb", ">800": "#ffffff", "primary": "#ffffff"},
-            "background": "#31bab0"
-        },
-        "Midnight": {
-            "colors": {"<100": "#5dd39e", "100-200": "#348aa7", "200-400": "#525174",
-                       "400-800": "#513b56", ">800": "#6c8ead", "primary": "#ffffff"},
-            "background": "#061529"
-        }
-    }
-    return presets.get(preset)
+    if result is None:
+        return None
+    lat, lon, used_downtown = result
+    if focus_downtown and not used_downtown:
+        st.warning(f"Could not find downtown for '{place}'. Using general location instead.")
+    return lat, lon
 
 def main():
     # Safe session key initialization with added stored_lat and stored_lon
@@ -142,15 +213,14 @@ def main():
         "stored_lat": 42.3579,  # Added separate storage for lat
         "stored_lon": -71.0604,  # Added separate storage for lon
         "location_set": False,   # Flag to track if location was set from place name
-        "location_name": ""      # Store the currently selected location name
+        "location_name": "",     # Store the currently selected location name
+        "session_id": uuid.uuid4().hex  # Identifies this session to the shared render pool
     }.items():
         if key not in st.session_state:
             st.session_state[key] = default
             
     st.title("🗘️ OSM Street Map Visualizer")
 
-    ox.settings.requests_kwargs = {'verify': False}
-
     # Create two columns for the sidebar and main content
 
     sidebar, main_content = st.columns([1, 3])
@@ -289,22 +359,25 @@ def main():
         if transparent_bg:
             background_color = "none"
         else:
-            background_color = st.color_picker("Background Color", value="#31bab0")
+            background_color = st.color_picker("Background Color", value=DEFAULT_BACKGROUND)
 
         show_legend = st.checkbox("Show Legend", value=True)
+
+        # Area layers drawn under the streets; toggling one only fetches and draws that layer
+        layer_names = st.multiselect("Layers", list(LAYERS), default=[], key="layers")
+        layer_colors = {}
+        if layer_names:
+            with st.expander("Layer Colors", expanded=False):
+                for name in layer_names:
+                    layer_colors[name] = st.color_picker(f"Color {name}", value=LAYERS[name]["color"],
+                                                         key=f"layer_color_{name}")
         
         # Road style settings directly in sidebar (no nested columns)
         with st.expander("Road Style Settings", expanded=False):
             # Custom style overrides
             st.markdown("#### Road Colors & Widths")
-            default_colors = {
-                "<100": "#d40a47", "100-200": "#e78119", "200-400": "#30bab0",
-                "400-800": "#bbbbbb", ">800": "#ffffff", "primary": "#ffffff"
-            }
-            default_widths = {
-                "<100": 0.3, "100-200": 0.45, "200-400": 0.6,
-                "400-800": 0.75, ">800": 0.5, "primary": 0.8
-            }
+            default_colors = DEFAULT_COLORS
+            default_widths = DEFAULT_WIDTHS
 
             custom_colors = {}
             custom_widths = {}
@@ -316,7 +389,7 @@ def main():
                 st.divider()
         
         # Generate button
-        generate_map = st.button("Generate Map", use_container_width=True)
+        generate_map = st.button("Generate Map", width="stretch")
             
     with main_content:
         # Create columns for map and info - no nesting here
@@ -329,47 +402,18 @@ def main():
             map_center = st.session_state["map_center"]
             map_zoom = st.session_state["map_zoom"]
 
-            # Create the folium map
-            m = folium.Map(location=map_center, zoom_start=map_zoom, tiles = None)
-            folium.TileLayer('CartoDB positron').add_to(m)
-            folium.TileLayer('CartoDB dark_matter').add_to(m)
-            folium.TileLayer(
-                tiles='https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png',
-                attr='OpenTopoMap',
-                name='OpenTopoMap',
-                overlay=False,
-                control=True
-            ).add_to(m)
-            folium.TileLayer(
-            tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-            attr='Esri',
-            name='Esri World Imagery',
-            overlay=False,
-            control=True
-        ).add_to(m)
-            folium.plugins.Fullscreen(
-                position="topright",
-                title="Expand me",
-                title_cancel="Exit me",
-                force_separate_button=True,
-            ).add_to(m)
-            folium.TileLayer('OpenStreetMap').add_to(m)
-            folium.LayerControl().add_to(m)
-
-            # folium.plugins.LocateControl().add_to(m)
-
-            # If you want get the user device position after load the map, set auto_start=True
-            folium.plugins.LocateControl(auto_start=False).add_to(m)
-
-            # Add draggable marker
-            marker = folium.Marker(
-                location=[marker_pos["lat"], marker_pos["lng"]],
-                draggable=False,
-                tooltip="Click the map to move me"
-            ).add_to(m)
+            # The base map is built once per session, so st_folium's payload is identical from rerun to rerun;
+            # marker, road preview and view are sent as feature groups / center / zoom updates instead
+            first_render = "base_map" not in st.session_state
+            if first_render:
+                st.session_state.base_map = base_map(map_center, map_zoom)
+            m = st.session_state.base_map
+            layers = preview_layers(marker_pos, map_zoom)
 
             # Display map with a specific key for proper state tracking
-            map_data = st_folium(m, height=780, width=None, key="folium_map")
+            map_data = st_folium(m, height=780, width=None, key="folium_map", center=map_center, zoom=map_zoom,
+                                 feature_group_to_add=layers, render=first_render)
+            detach_layers(m, layers)
     
             # st.markdown("### Current Location")
             # st.write(f"Latitude: {marker_pos['lat']:.5f}")
@@ -404,6 +448,23 @@ def main():
             # Debug output
             if st.checkbox("Show Debug Info", value=False):
                 st.write("Map Data:", map_data)
+                st.write("Pipeline stages:", stage_stats(st.session_state.get("renderer")))
+                st.write("Geocode cache:", get_geocode_cache().stats())
+                st.write("Render cache:", get_render_cache().stats())
+                st.write("Layer cache:", get_layer_cache().stats())
+                st.write("Last large-area fetch:", get_graph_store().large_area.last_stats)
+                st.write("Last render (seconds since Generate):", st.session_state.get("render_timings", {}))
+                st.write("Warm-up:", start_warm_up(), METRICS.last.get("warm_up"))
+            # Stage timings, memory, sizes and cache hit rates for this process; also in MAP_ART_METRICS_FILE/_LOG
+            if st.checkbox("Show Metrics", value=False):
+                metrics = get_metrics().snapshot()
+                st.write("Last render:", metrics["last"].get("render"))
+                st.write("Last export:", metrics["last"].get("export"))
+                st.write("Stages (seconds, bytes):", metrics["summaries"])
+                st.write("Jobs:", metrics["counters"])
+                st.write("Caches:", metrics["caches"])
+                st.write(f"Resident memory: {(metrics['resident_bytes'] or 0) / 1024 ** 2:.0f} MB")
+                st.code(get_metrics().prometheus_text(), language="text")
         # Handles map clicks and drags
         def floats_close(a, b, tol=1e-2):
             return abs(a - b) < tol
@@ -437,68 +498,94 @@ def main():
             if not transparent_bg:
                 background_color = style["background"]
 
-        # Only generate the map when the button is clicked
+        # The map the current inputs describe, so a render started for other inputs can be dropped
+        center_lat = st.session_state["marker_pos"]["lat"]
+        center_lon = st.session_state["marker_pos"]["lng"]
+        if use_place and place:
+            if "focus_downtown" in locals() and focus_downtown:
+                # When getting the actual graph, we'll use a smaller area
+                # but continue to use the original place name
+                bbox_size = min(bbox_size, 0.015)  # Smaller bounding box for downtown
+            source = ("place", place)
+        else:
+            # Bounding box centered on the marker position, not the map center
+            source = ("bbox", (center_lat + bbox_size, center_lat - bbox_size, center_lon + bbox_size, center_lon - bbox_size))
+        style = freeze_style(custom_colors, custom_widths, background_color, show_legend)
+        layer_style = tuple((name, layer_colors[name]) for name in LAYERS if name in layer_colors)
+
+        manager = get_job_manager()
+        session_id = st.session_state["session_id"]
+        job = manager.get(st.session_state.get("job_id"))
+        if job is not None and not job.done.is_set() and job.key != (source, style, layer_style):
+            manager.cancel(job.id, session_id)
+            del st.session_state["job_id"]
+            st.info("Inputs changed, so the map being generated was cancelled.")
+
+        # Only generate the map when the button is clicked; the work runs on the render pool
         if "generate_map" in locals() and generate_map:
-            with st.spinner("Generating..."):
-                # Get the bounding box centered on current marker position, not map center
-                # This ensures the generated map shows the area around the marker
-                center_lat = st.session_state["marker_pos"]["lat"]
-                center_lon = st.session_state["marker_pos"]["lng"]
-                
-                # Get the appropriate search query based on downtown focus
-                if use_place and place:
-                    search_query = place
-                    if "focus_downtown" in locals() and focus_downtown:
-                        # When getting the actual graph, we'll use a smaller area
-                        # but continue to use the original place name
-                        bbox_size = min(bbox_size, 0.015)  # Smaller bounding box for downtown
-                    
-                    # Use place name to get graph
-                    G = get_graph(place=search_query)
-                else:
-                    # Use bounding box to get graph
-                    bbox = (center_lat + bbox_size, center_lat - bbox_size, center_lon + bbox_size, center_lon - bbox_size)
-                    G = get_graph(bbox=bbox)
-
-                if not G or not G.edges:
-                    st.error("No road data found. Try adjusting your input.")
-                else:
-                    _, _, _, data = extract_graph_edges(G)
-                    road_colors, road_widths = classify_road_segments(data, custom_colors, custom_widths)
-                    fig, ax = plot_graph(G, road_colors, road_widths, background_color)
-
-                    if show_legend:
-                        add_legend(ax, custom_colors)
-
-                    st.session_state.fig = fig  # 💾 Save the figure to session state
+            st.session_state.pop("job_error", None)
+            # The previous map makes way for the new one's quick preview
+            st.session_state.pop("map_png", None)
+            if "renderer" not in st.session_state:
+                st.session_state.renderer = MapRenderer()
+            renderer = st.session_state.renderer
+            # Caches are attached before the first job reports to the metrics file
+            get_metrics()
+            # The network is memoized on the source alone, so style-only changes skip fetching it
+            fetch = partial(get_network, store=get_graph_store(), tile_cache=get_tile_cache())
+            job = manager.submit((source, style, layer_style), session_id,
+                                 partial(run_render, source=source, style=style, layer_style=layer_style,
+                                         renderer=renderer, fetch=fetch))
+            st.session_state["job_id"] = job.id
+
+        if "job_id" in st.session_state:
+            show_job_progress()
+        if "job_error" in st.session_state:
+            st.error(st.session_state["job_error"])
 
         # ✅ Display the plot and download options if a map has been generated
-        if "fig" in st.session_state:
-            # Use full width for the visualization
-            st.pyplot(st.session_state.fig, use_container_width=True)
+        if "map_png" in st.session_state:
+            # Use full width for the visualization; encoded once by the render job
+            st.image(st.session_state.map_png, width="stretch")
+            timings = st.session_state.get("render_timings", {})
+            if "preview" in timings:
+                st.caption(f"Preview in {timings['preview']:.1f}s, full resolution in {timings['full']:.1f}s")
 
             # Export options - without nesting columns
-            download_cols = st.columns([3, 1])
+            download_cols = st.columns([2, 1, 1, 1])
             with download_cols[0]:
                 # Let user name the file
                 filename = st.text_input("Filename for download (no extension)", value="street_map")
-            
+
             with download_cols[1]:
-                # Image export
-                buf = io.BytesIO()
-                st.session_state.fig.savefig(
-                    buf, format="png", dpi=300, bbox_inches='tight',
-                    transparent=(background_color == "none")
-                )
+                print_size = st.selectbox("Print size (300 dpi)", list(PRINT_SIZES), key="print_size")
+
+            with download_cols[2]:
+                export_format = st.selectbox("Format", ["PNG", "SVG", "PDF"])
 
+            with download_cols[3]:
+                # Export is rendered only when the button is actually clicked
+                geometry, classes, style, fingerprint, layers = st.session_state.export_args
+                fmt = export_format.lower()
+                if fmt == "png":
+                    render, mime = png_download(geometry, classes, style, print_size, layers=layers), "image/png"
+                else:
+                    render = vector_download(geometry, classes, style, print_size, fmt, layers=layers)
+                    mime = "image/svg+xml" if fmt == "svg" else "application/pdf"
+                # Looked up only on click: exported before by anyone, the bytes are served as-is, otherwise rendered
+                # and kept
+                key = RenderCache.key(fingerprint, style, fmt, size=print_size, dpi=300)
+                data = get_render_cache().download(key, measured_export(render, fmt, print_size))
                 st.download_button(
-                    "Download Map as PNG",
-                    data=buf.getvalue(),
-                    file_name=f"{filename}.png",
-                    mime="image/png",
-                    use_container_width=True
+                    f"Download Map as {export_format}",
+                    data=data,
+                    file_name=f"{filename}.{export_format.lower()}",
+                    mime=mime,
+                    width="stretch"
                 )
 
+    # After the page is out, so the first run does not wait on it
+    start_warm_up()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,265 @@
+import json
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from map_art_app.export import PRINT_SIZES, export_png, print_size_pixels
+from map_art_app.graph_store import GraphStore
+from map_art_app.pipeline import prepare_network
+from map_art_app.presets import preset_style
+from map_art_app.tiles import TiledGraphCache
+from map_art_app.vector import export_pdf, export_svg
+
+FORMATS = ("png", "svg", "pdf")
+# Half the side of a "center" area in degrees, same default as the app's Bounding Box Size slider
+DEFAULT_AREA_SIZE = 0.015
+LEDGER_NAME = "ledger.jsonl"
+
+Job = namedtuple("Job", "id source preset size fmt dpi legend")
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).lower()).strip("-")
+
+
+def area_source(area):
+    """(name, source) for a manifest area: {"place": ...}, {"bbox": [left, bottom, right, top]} or {"center": [lat, lon]}"""
+    if "place" in area:
+        return area.get("name") or _slug(area["place"]), ("place", area["place"])
+    if "bbox" in area:
+        bbox = tuple(float(v) for v in area["bbox"])
+    elif "center" in area:
+        lat, lon = area["center"]
+        size = area.get("size", DEFAULT_AREA_SIZE)
+        bbox = (lon - size, lat - size, lon + size, lat + size)
+    else:
+        raise ValueError(f"Manifest area needs a place, bbox or center: {area}")
+    return area.get("name") or _slug("bbox " + " ".join(f"{v:.4f}" for v in bbox)), ("bbox", bbox)
+
+
+def expand_jobs(manifest):
+    """Every areas x presets x sizes x formats combination of a manifest, grouped by area"""
+    presets = manifest.get("presets", ["None"])
+    sizes = manifest.get("sizes", [next(iter(PRINT_SIZES))])
+    formats = manifest.get("formats", ["png"])
+    dpi = manifest.get("dpi", 300)
+    legend = manifest.get("legend", True)
+    for size in sizes:
+        if size not in PRINT_SIZES:
+            raise ValueError(f"Unknown print size '{size}'; choose from {', '.join(PRINT_SIZES)}")
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}'; choose from {', '.join(FORMATS)}")
+    # Validate preset names up front rather than failing every job that uses them
+    for preset in presets:
+        preset_style(preset)
+
+    jobs = []
+    for area in manifest["areas"]:
+        name, source = area_source(area)
+        for preset in presets:
+            for size in sizes:
+                for fmt in formats:
+                    job_id = f"{_slug(name)}_{_slug(preset)}_{_slug(size)}.{fmt}"
+                    jobs.append(Job(job_id, source, preset, size, fmt, dpi, legend))
+    ids = [job.id for job in jobs]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Manifest areas must have distinct names")
+    return jobs
+
+
+class Ledger:
+    """Append-only JSONL record of finished and failed jobs in the output folder, so an interrupted batch resumes
+    where it stopped; only finished jobs count as done"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line from a killed run
+                        continue
+                    if "error" not in entry:
+                        self.done[entry["id"]] = entry
+
+    @staticmethod
+    def _spec(job):
+        return json.loads(json.dumps(job._asdict()))
+
+    def is_done(self, job, out_dir):
+        """Finished with the same settings, and its output is still there"""
+        entry = self.done.get(job.id)
+        return (entry is not None and entry["spec"] == self._spec(job)
+                and os.path.exists(os.path.join(out_dir, job.id)))
+
+    def record(self, job, timings):
+        entry = {"id": job.id, "spec": self._spec(job), "timings": timings, "finished": time.time()}
+        self._append(entry)
+        self.done[job.id] = entry
+
+    def record_failure(self, job, error):
+        """Log a failed job; it is retried on the next run"""
+        self._append({"id": job.id, "spec": self._spec(job), "error": error, "failed": time.time()})
+
+    def _append(self, entry):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def download_source(source, tiles):
+    """Make sure the raw data for a source is in the store; returns the number of downloads it took"""
+    kind, value = source
+    if kind == "bbox":
+        return 1 if tiles.prefetch(value) else 0
+    store = tiles.store
+    if store.cache.get(store.place_key(value)) is not None:
+        return 0
+    store.graph_from_place(value)
+    return 1
+
+
+# Set in each worker process by _init_worker; graphs come only from the store the parent already filled
+_worker_tiles = None
+
+
+def _init_worker(store_root, max_bytes):
+    global _worker_tiles
+    _worker_tiles = TiledGraphCache(GraphStore(store_root, max_bytes, offline=True))
+
+
+def graph_for_source(source, tiles):
+    kind, value = source
+    if kind == "place":
+        return tiles.store.graph_from_place(value)
+    return tiles.graph_from_bbox(value)
+
+
+def network_for_source(source, tiles):
+    """RoadNetwork of a source mapped from the store, built from its graph (tiles stitched for a bbox) on a miss"""
+    store = tiles.store
+    return store.network(store.source_key(source), lambda: graph_for_source(source, tiles))
+
+
+def prepare_source(source):
+    """Build a source's RoadNetwork once per batch so jobs just map it; returns seconds spent"""
+    start = time.perf_counter()
+    network_for_source(source, _worker_tiles)
+    return time.perf_counter() - start
+
+
+def _write_atomic(path, mode, write):
+    tmp_path = os.path.join(os.path.dirname(path), f".tmp-{os.getpid()}-{os.path.basename(path)}")
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def run_job(job, out_dir):
+    """Render one job into out_dir; returns per-stage timings in seconds"""
+    start = time.perf_counter()
+    network = prepare_network(job.source, lambda s: network_for_source(s, _worker_tiles))
+    if network is None:
+        raise ValueError(f"No road data for {job.source}")
+    geometry, classes = network
+    style = preset_style(job.preset, show_legend=job.legend)
+    prepared = time.perf_counter()
+
+    width_cm, height_cm = PRINT_SIZES[job.size]
+    path = os.path.join(out_dir, job.id)
+    if job.fmt == "png":
+        size_px = print_size_pixels(width_cm, height_cm, job.dpi)
+        _write_atomic(path, "wb", lambda f: export_png(f, geometry, classes, style, *size_px, dpi=job.dpi))
+    elif job.fmt == "svg":
+        _write_atomic(path, "w", lambda f: export_svg(f, geometry, classes, style, width_cm, height_cm, job.dpi))
+    else:
+        _write_atomic(path, "wb", lambda f: export_pdf(f, geometry, classes, style, width_cm, height_cm, job.dpi))
+    end = time.perf_counter()
+    return {"network": prepared - start, "render": end - prepared, "total": end - start, "pid": os.getpid()}
+
+
+def run_batch(manifest, out_dir, workers=None, store=None, log=print):
+    """Render every job of a manifest not already in out_dir's ledger; returns a summary dict"""
+    store = store or GraphStore()
+    os.makedirs(out_dir, exist_ok=True)
+    ledger = Ledger(os.path.join(out_dir, LEDGER_NAME))
+    jobs = expand_jobs(manifest)
+    pending = [job for job in jobs if not ledger.is_done(job, out_dir)]
+    summary = {"jobs": len(jobs), "skipped": len(jobs) - len(pending), "rendered": 0, "failed": {},
+               "sources": 0, "downloads": 0}
+    log(f"{len(jobs)} jobs, {summary['skipped']} already in the ledger")
+    started = time.perf_counter()
+
+    # Each distinct area is downloaded once here, serially (Overpass rate-limits parallel clients); workers only
+    # ever read the store
+    tiles = TiledGraphCache(store)
+    sources = list(dict.fromkeys(job.source for job in pending))
+    summary["sources"] = len(sources)
+    unavailable = {}
+    for source in sources:
+        try:
+            summary["downloads"] += download_source(source, tiles)
+        except Exception as e:
+            log(f"fetch failed for {source}: {e}")
+            unavailable[source] = str(e)
+    summary["fetch_seconds"] = time.perf_counter() - started
+
+    def failed(job, error):
+        ledger.record_failure(job, error)
+        summary["failed"][job.id] = error
+
+    def drop_unavailable():
+        for job in pending:
+            if job.source in unavailable:
+                failed(job, unavailable[job.source])
+        return ([source for source in sources if source not in unavailable],
+                [job for job in pending if job.source not in unavailable])
+
+    sources, pending = drop_unavailable()
+
+    def finished(job, timings):
+        ledger.record(job, timings)
+        summary["rendered"] += 1
+        log(f"[{summary['rendered']}/{len(pending)}] {job.id}  network {timings['network']:.2f}s  "
+            f"render {timings['render']:.2f}s  total {timings['total']:.2f}s")
+
+    init_args = (store.cache.root, store.max_bytes)
+    with ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker, initargs=init_args) as pool:
+        # Build every area's network once, in parallel, before the jobs that share it start
+        summary["prepare_seconds"] = 0
+        prepares = {pool.submit(prepare_source, source): source for source in sources}
+        for future in as_completed(prepares):
+            source = prepares[future]
+            try:
+                summary["prepare_seconds"] += future.result()
+            except Exception as e:
+                log(f"network build failed for {source}: {e}")
+                unavailable[source] = str(e)
+        sources, pending = drop_unavailable()
+
+        futures = {pool.submit(run_job, job, out_dir): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                finished(job, future.result())
+            except Exception as e:
+                failed(job, str(e))
+                log(f"{job.id} failed: {e}")
+
+    summary["seconds"] = time.perf_counter() - started
+    log(f"{summary['rendered']} rendered, {summary['skipped']} skipped, {len(summary['failed'])} failed "
+        f"in {summary['seconds']:.1f}s ({summary['sources']} areas, {summary['downloads']} downloaded, "
+        f"{summary['fetch_seconds']:.1f}s fetching, {summary['prepare_seconds']:.1f}s building networks)")
+    return summary
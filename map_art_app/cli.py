@@ -0,0 +1,82 @@
+"""Headless entry points: `map-art render manifest.json -o posters/`, `map-art grid cities.json -o grid.png`,
+`map-art prewarm-geocode cities.txt` and `map-art fetch-place "Los Angeles, California"`
+
+A manifest is JSON with "areas" (each a "place", a "bbox" [left, bottom, right, top] or a "center" [lat, lon]
+with an optional "size", plus an optional "name") and optional "presets", "sizes", "formats", "dpi" and "legend";
+every combination is rendered. A grid spec is described in map_art_app.grid.run_grid.
+"""
+import argparse
+import json
+import sys
+
+from map_art_app.batch import run_batch
+from map_art_app.geocode import GeocodeCache
+from map_art_app.graph_store import GraphStore
+from map_art_app.grid import run_grid
+from map_art_app.large_area import LargeAreaFetcher, peak_rss_mb
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="map-art")
+    commands = parser.add_subparsers(dest="command", required=True)
+    render = commands.add_parser("render", help="render every job of a manifest")
+    render.add_argument("manifest", help="JSON manifest of areas x presets x sizes x formats")
+    render.add_argument("-o", "--out", default="posters", help="output folder, also holds the resume ledger")
+    render.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    render.add_argument("--store", default=None, help="graph store directory (default: MAP_ART_GRAPH_STORE)")
+    render.add_argument("--offline", action="store_true", default=None,
+                        help="only use graphs already in the store, e.g. a fixture directory")
+    grid = commands.add_parser("grid", help="render several places side by side on one poster")
+    grid.add_argument("spec", help="JSON grid spec: places plus optional columns, preset, size, dpi, radius_km")
+    grid.add_argument("-o", "--out", default="grid.png", help="output PNG")
+    grid.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    grid.add_argument("--store", default=None, help="graph store directory (default: MAP_ART_GRAPH_STORE)")
+    grid.add_argument("--offline", action="store_true", default=None,
+                      help="only use graphs already in the store, e.g. a fixture directory")
+    prewarm = commands.add_parser("prewarm-geocode", help="resolve a list of place names into the geocode cache")
+    prewarm.add_argument("places", help="text file with one place name per line")
+    prewarm.add_argument("--no-downtown", dest="focus_downtown", action="store_false",
+                         help="cache the general location instead of the downtown lookup")
+    fetch = commands.add_parser("fetch-place", help="download a place graph into the store, cell by cell if large")
+    fetch.add_argument("place", help="place name, as typed in the app")
+    fetch.add_argument("--store", default=None, help="graph store directory (default: MAP_ART_GRAPH_STORE)")
+    fetch.add_argument("-j", "--jobs", type=int, default=None, help="concurrent cell requests (MAP_ART_FETCH_WORKERS)")
+    fetch.add_argument("--interval", type=float, default=None,
+                       help="minimum seconds between cell requests (MAP_ART_FETCH_INTERVAL)")
+    fetch.add_argument("--cell", type=float, default=None, help="cell size in degrees (MAP_ART_AREA_CELL)")
+    args = parser.parse_args(argv)
+
+    if args.command == "fetch-place":
+        store = GraphStore(args.store)
+        store.large_area = LargeAreaFetcher(store.network_type, cell_size=args.cell, workers=args.jobs,
+                                            interval=args.interval)
+        G = store.graph_from_place(args.place)
+        peak = peak_rss_mb()
+        peak = "n/a" if peak is None else f"{peak:.0f} MB"
+        print(f"{args.place}: {len(G):,} nodes, {G.number_of_edges():,} edges, peak RSS {peak} ({store.cache.root})")
+        if store.large_area.last_stats is not None:
+            print(json.dumps(store.large_area.last_stats))
+        return 0
+
+    if args.command == "prewarm-geocode":
+        with open(args.places) as f:
+            places = [line.strip() for line in f if line.strip()]
+        cache = GeocodeCache()
+        found = cache.prewarm(places, focus_downtown=args.focus_downtown)
+        print(f"{found}/{len(places)} places resolved, {cache.lookups} network lookups ({cache.path})")
+        return 0 if found == len(places) else 1
+
+    if args.command == "grid":
+        with open(args.spec) as f:
+            spec = json.load(f)
+        summary = run_grid(spec, args.out, workers=args.jobs, store=GraphStore(args.store, offline=args.offline))
+        return 1 if summary["failed"] else 0
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    summary = run_batch(manifest, args.out, workers=args.jobs, store=GraphStore(args.store, offline=args.offline))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction just runs without the cross-process lock
+    fcntl = None
+
+
+class DiskLRU:
+    """Directory of cache files shared between processes, evicted least-recently-used first by total bytes"""
+
+    def __init__(self, root, max_bytes, suffix=""):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.root, f"{key}{self.suffix}")
+
+    def get(self, key):
+        """Return the path of a cached entry (marking it recently used), or None on a miss"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except PermissionError:
+            # Read-only fixture directories can still be served, just without LRU bookkeeping
+            if not os.path.exists(path):
+                return None
+        return path
+
+    def put(self, key, write):
+        """Write an entry atomically via write(fileobj) so concurrent readers never see partial files"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-", suffix=self.suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, self.path_for(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+        return self.path_for(key)
+
+    def entries(self):
+        """List (mtime, size, path) for every complete entry"""
+        entries = []
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.name.startswith(".") or not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Drop the least recently used entries until the directory fits in max_bytes"""
+        with open(os.path.join(self.root, ".lock"), "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Another worker is already evicting
+                    return
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except PermissionError:
+                    # Windows: still memory-mapped by a reader (see network.load_network); retried next time
+                    continue
+                total -= size
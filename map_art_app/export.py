@@ -0,0 +1,144 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+
+from map_art_app.render import add_legend
+from map_art_app.roads import ROAD_CLASSES
+
+CM_PER_INCH = 2.54
+# (width, height) in cm
+PRINT_SIZES = {
+    "8 x 8 in": (20.32, 20.32),
+    "A4 (21 x 29.7 cm)": (21.0, 29.7),
+    "A3 (29.7 x 42 cm)": (29.7, 42.0),
+    "18 x 24 in": (45.72, 60.96),
+    "24 x 36 in": (60.96, 91.44),
+    "60 x 90 cm": (60.0, 90.0),
+}
+# Line widths and legend sizes are tuned for the 8 in wide on-screen figure and scale up with the print
+REFERENCE_INCHES = 8
+STRIP_ROWS = 256
+
+
+def print_size_pixels(width_cm, height_cm, dpi=300):
+    return round(width_cm / CM_PER_INCH * dpi), round(height_cm / CM_PER_INCH * dpi)
+
+
+def poster_window(bounds, width_px, height_px, padding=0.02):
+    """Data window covering bounds (plus padding) at the poster's aspect, with the latitude aspect correction"""
+    left, bottom, right, top = bounds
+    pad_x, pad_y = (right - left) * padding, (top - bottom) * padding
+    left, right, bottom, top = left - pad_x, right + pad_x, bottom - pad_y, top + pad_y
+    # Ground-true height of one degree of latitude relative to one degree of longitude
+    stretch = 1 / np.cos(np.deg2rad((bottom + top) / 2))
+    width, height = right - left, (top - bottom) * stretch
+    if width / height < width_px / height_px:
+        width = height * width_px / height_px
+    else:
+        height = width * height_px / width_px
+    cx, cy = (left + right) / 2, (bottom + top) / 2
+    return cx - width / 2, cy - height / stretch / 2, cx + width / 2, cy + height / stretch / 2
+
+
+def _png_chunk(f, tag, data):
+    f.write(struct.pack(">I", len(data)))
+    f.write(tag)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(tag))))
+
+
+def write_png(f, width, height, strips, level=6):
+    """Encode an RGBA PNG from an iterable of (rows, width, 4) uint8 strips, compressing each strip as it arrives"""
+    f.write(b"\x89PNG\r\n\x1a\n")
+    _png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+    compressor = zlib.compressobj(level)
+    for strip in strips:
+        # Filter type 0 on every row: flat fills with thin lines compress better unfiltered than with Sub/Up
+        filtered = np.zeros((len(strip), width * 4 + 1), dtype=np.uint8)
+        filtered[:, 1:] = strip.reshape(len(strip), width * 4)
+        data = compressor.compress(filtered.tobytes())
+        if data:
+            _png_chunk(f, b"IDAT", data)
+    _png_chunk(f, b"IDAT", compressor.flush())
+    _png_chunk(f, b"IEND", b"")
+
+
+def render_strips(geometry, classes, style, width_px, height_px, dpi=300, strip_rows=STRIP_ROWS, layers=(),
+                  bounds=None):
+    """Yield the poster as horizontal RGBA strips drawn on one reused strip-sized Agg canvas
+
+    Each yielded array is a view into the canvas and is overwritten by the next strip. layers are (name,
+    PolygonLayer, color) area layers drawn under the roads, bottom first. The poster is framed on bounds, by
+    default the network's own.
+    """
+    # Only exports need the Agg canvas; the app imports this module for PRINT_SIZES on its first page
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection, PathCollection
+    from matplotlib.figure import Figure
+    from matplotlib.transforms import IdentityTransform
+
+    colors, widths, background_color, show_legend = style
+    custom_colors, custom_widths = dict(colors), dict(widths)
+    scale = min(width_px, height_px) / dpi / REFERENCE_INCHES
+
+    left, bottom, right, top = poster_window(bounds or geometry.bounds, width_px, height_px)
+    dy = (top - bottom) / height_px
+    # Per-edge vertical extent, so each strip only builds the edges that can touch it
+    starts = geometry.offsets[:-1]
+    edge_ymin = np.minimum.reduceat(geometry.vertices[:, 1], starts)
+    edge_ymax = np.maximum.reduceat(geometry.vertices[:, 1], starts)
+    margin = max(custom_widths.values()) * scale * dpi / 72 * dy
+    segments = geometry.segments()
+    layer_extents = [layer.y_extents() for _, layer, _ in layers]
+
+    # The last strip is drawn full height too (running past the poster's bottom edge) and cropped
+    fig = Figure(figsize=(width_px / dpi, strip_rows / dpi), dpi=dpi, facecolor=background_color)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.set_axis_off()
+    ax.set_xlim(left, right)
+
+    for row in range(0, height_px, strip_rows):
+        strip_top = top - row * dy
+        strip_bottom = top - (row + strip_rows) * dy
+        ax.set_ylim(strip_bottom, strip_top)
+        for collection in list(ax.collections):
+            collection.remove()
+
+        for (_, layer, color), (ymin, ymax) in zip(layers, layer_extents):
+            members = np.flatnonzero((ymax >= strip_bottom) & (ymin <= strip_top))
+            if len(members):
+                ax.add_collection(PathCollection([layer.path(members)], facecolors=color, edgecolors="none",
+                                                 linewidths=0, zorder=0.5), autolim=False)
+        visible = (edge_ymax >= strip_bottom - margin) & (edge_ymin <= strip_top + margin)
+        for code, name in enumerate(ROAD_CLASSES):
+            members = np.flatnonzero(visible & (classes == code))
+            if len(members):
+                ax.add_collection(LineCollection([segments[i] for i in members], colors=custom_colors[name],
+                                                 linewidths=custom_widths[name] * scale), autolim=False)
+        if show_legend:
+            # Anchor at the poster's lower-left corner, in this strip's pixel coordinates
+            add_legend(ax, custom_colors, markersize=16 * scale, fontsize=16 * scale,
+                       bbox_to_anchor=(0, -(height_px - row - strip_rows)), bbox_transform=IdentityTransform())
+
+        canvas.draw()
+        yield np.asarray(canvas.buffer_rgba())[:min(strip_rows, height_px - row), :width_px]
+
+
+def export_png(f, geometry, classes, style, width_px, height_px, dpi=300, strip_rows=STRIP_ROWS, layers=()):
+    """Stream a print-size PNG into f; peak memory is bounded by one strip rather than the whole poster"""
+    write_png(f, width_px, height_px,
+              render_strips(geometry, classes, style, width_px, height_px, dpi, strip_rows, layers))
+
+
+def png_download(geometry, classes, style, size_name, dpi=300, layers=()):
+    """Zero-argument callable for st.download_button: the PNG is only rendered when the user clicks"""
+    def render():
+        buf = io.BytesIO()
+        export_png(buf, geometry, classes, style, *print_size_pixels(*PRINT_SIZES[size_name], dpi), dpi=dpi,
+                   layers=layers)
+        buf.seek(0)
+        return buf
+    return render
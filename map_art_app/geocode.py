@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+DEFAULT_PATH = os.path.join("~", ".cache", "map_art_app", "geocode.sqlite")
+POSITIVE_TTL = 90 * 24 * 3600
+# Places that do not resolve are retried sooner, in case OSM gains them or the lookup was a fluke
+NEGATIVE_TTL = 24 * 3600
+
+
+def normalize_query(query):
+    """Case, whitespace and stray comma insensitive form of a place query, used as the cache key"""
+    parts = [" ".join(part.split()) for part in query.lower().split(",")]
+    return ", ".join(part for part in parts if part)
+
+
+def geocode_point(query):
+    """Centroid (lat, lon) of the place Nominatim returns for query, or None if it finds nothing"""
+    # osmnx (and geopandas behind it) is only imported on the first lookup the cache cannot answer
+    import osmnx as ox
+
+    # What Nominatim answers for a query it cannot place is 0 results or no polygon (ValueError on osmnx 1.x).
+    # Anything else (timeouts, HTTP errors) is raised and never cached.
+    try:
+        gdf = ox.geocode_to_gdf(query)
+    except (ox._errors.InsufficientResponseError, TypeError, ValueError):
+        return None
+    if gdf.empty:
+        return None
+    centroid = gdf.geometry.iloc[0].centroid
+    return centroid.y, centroid.x
+
+
+class GeocodeCache:
+    """Persistent place -> coordinates cache in SQLite, shared by every Streamlit worker using the same file
+
+    Misses are cached too (for a shorter time), and a downtown lookup is stored together with its fallback,
+    so a place seen before resolves without any network call.
+    """
+
+    def __init__(self, path=None, positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL, geocode=geocode_point):
+        path = path or os.environ.get("MAP_ART_GEOCODE_CACHE", DEFAULT_PATH)
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.geocode = geocode
+        self.hits = 0
+        self.misses = 0
+        self.lookups = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as db, db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS geocode "
+                       "(query TEXT PRIMARY KEY, lat REAL, lon REAL, downtown INTEGER, expires REAL)")
+
+    def _connect(self):
+        # One short-lived connection per call: Streamlit runs sessions on different threads
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get(self, key):
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT lat, lon, downtown, expires FROM geocode WHERE query = ?", (key,)).fetchone()
+        if row is None or row[3] < time.time():
+            return None
+        return row[:3]
+
+    def _put(self, key, lat, lon, downtown):
+        ttl = self.negative_ttl if lat is None else self.positive_ttl
+        with closing(self._connect()) as db, db:
+            db.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?)",
+                       (key, lat, lon, downtown, time.time() + ttl))
+
+    def _lookup(self, query):
+        with self._lock:
+            self.lookups += 1
+        return self.geocode(query)
+
+    def resolve(self, place, focus_downtown=True):
+        """(lat, lon, used_downtown) for place, or None if it cannot be found
+
+        With focus_downtown, "downtown <place>" is tried first and the plain place is the fallback; whichever
+        answered is cached under one entry.
+        """
+        key = normalize_query(place)
+        if focus_downtown:
+            key = f"downtown|{key}"
+        row = self._get(key)
+        if row is not None:
+            with self._lock:
+                self.hits += 1
+            lat, lon, downtown = row
+            return None if lat is None else (lat, lon, bool(downtown))
+        with self._lock:
+            self.misses += 1
+
+        point, downtown = None, False
+        if focus_downtown:
+            point = self._lookup(f"downtown {place}")
+            downtown = point is not None
+        if point is None:
+            plain = self._get(normalize_query(place)) if focus_downtown else None
+            if plain is not None:
+                point = None if plain[0] is None else plain[:2]
+            else:
+                point = self._lookup(place)
+                if focus_downtown:
+                    self._put(normalize_query(place), *(point or (None, None)), False)
+        self._put(key, *(point or (None, None)), downtown)
+        return None if point is None else (*point, downtown)
+
+    def prewarm(self, places, focus_downtown=True):
+        """Resolve a list of place names ahead of time; returns how many of them were found"""
+        return sum(self.resolve(place, focus_downtown) is not None for place in places)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "network_lookups": self.lookups}
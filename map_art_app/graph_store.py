@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import shapely
+
+from map_art_app.diskcache import DiskLRU
+from map_art_app.metrics import METRICS
+from map_art_app.network import NETWORK_VERSION, RoadNetwork, load_network, save_network
+
+DEFAULT_ROOT = os.path.join("~", ".cache", "map_art_app", "graphs")
+DEFAULT_MAX_MB = 2048
+# How max_bytes is split between the store's directories: graphs, their compact networks (about two thirds the size
+# of a graph) and area layers
+BUDGET_SHARES = {"graphs": 0.5, "networks": 0.3, "layers": 0.2}
+
+# Edge attributes kept in the store besides length and geometry; values are dictionary-encoded
+EDGE_ATTRS = ("highway", "name", "oneway", "reversed")
+
+
+class GraphNotCached(LookupError):
+    """Raised by an offline store when a requested graph is not on disk"""
+
+
+def _encode_values(values):
+    """Dictionary-encode arbitrary attribute values (str, list, bool, missing) into int codes and a JSON vocabulary"""
+    vocab = {}
+    codes = np.full(len(values), -1, dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        token = json.dumps(value)
+        codes[i] = vocab.setdefault(token, len(vocab))
+    return codes, np.array(list(vocab), dtype=str)
+
+
+def save_graph(G, f):
+    """Write a graph as flat node/edge arrays (no pickle) to a path or binary file object"""
+    node_ids, node_data = zip(*G.nodes(data=True)) if len(G) else ((), ())
+    u, v, keys, data = zip(*G.edges(keys=True, data=True)) if G.number_of_edges() else ((), (), (), ())
+
+    geom_offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    geom_parts = []
+    for i, d in enumerate(data):
+        geom = d.get("geometry")
+        n = 0
+        if geom is not None:
+            coords = shapely.get_coordinates(geom)
+            geom_parts.append(coords)
+            n = len(coords)
+        geom_offsets[i + 1] = geom_offsets[i] + n
+
+    arrays = {
+        "meta": np.array(json.dumps({k: v for k, v in G.graph.items() if isinstance(v, (str, int, float, bool))})),
+        "node_id": np.array(node_ids, dtype=np.int64),
+        "node_x": np.array([d["x"] for d in node_data], dtype=np.float64),
+        "node_y": np.array([d["y"] for d in node_data], dtype=np.float64),
+        "node_street_count": np.array([d.get("street_count", 0) for d in node_data], dtype=np.int32),
+        "edge_u": np.array(u, dtype=np.int64),
+        "edge_v": np.array(v, dtype=np.int64),
+        "edge_key": np.array(keys, dtype=np.int64),
+        "edge_length": np.array([d.get("length", np.nan) for d in data], dtype=np.float64),
+        "geom_offsets": geom_offsets,
+        "geom_coords": np.concatenate(geom_parts) if geom_parts else np.empty((0, 2)),
+    }
+    for attr in EDGE_ATTRS:
+        arrays[f"edge_{attr}"], arrays[f"vocab_{attr}"] = _encode_values([d.get(attr) for d in data])
+    np.savez(f, **arrays)
+
+
+def load_graph(path):
+    """Rebuild an osmnx-compatible MultiDiGraph from a file written by save_graph"""
+    import networkx as nx
+
+    with np.load(path, allow_pickle=False) as z:
+        arrays = {name: z[name] for name in z.files}
+
+    G = nx.MultiDiGraph(**json.loads(str(arrays["meta"])))
+    G.add_nodes_from(
+        (int(n), {"x": float(x), "y": float(y), "street_count": int(c)})
+        for n, x, y, c in zip(arrays["node_id"], arrays["node_x"], arrays["node_y"], arrays["node_street_count"])
+    )
+
+    edge_count = len(arrays["edge_u"])
+    attrs = [{} for _ in range(edge_count)]
+    lengths = arrays["edge_length"]
+    for i in np.flatnonzero(~np.isnan(lengths)):
+        attrs[i]["length"] = float(lengths[i])
+    for attr in EDGE_ATTRS:
+        vocab = [json.loads(token) for token in arrays[f"vocab_{attr}"]]
+        codes = arrays[f"edge_{attr}"]
+        for i in np.flatnonzero(codes >= 0):
+            attrs[i][attr] = vocab[codes[i]]
+
+    offsets = arrays["geom_offsets"]
+    counts = np.diff(offsets)
+    has_geom = np.flatnonzero(counts > 0)
+    if len(has_geom):
+        lines = shapely.linestrings(arrays["geom_coords"], indices=np.repeat(np.arange(len(has_geom)), counts[has_geom]))
+        for i, line in zip(has_geom, lines):
+            attrs[i]["geometry"] = line
+
+    G.add_edges_from(
+        (int(u), int(v), int(k), d)
+        for u, v, k, d in zip(arrays["edge_u"], arrays["edge_v"], arrays["edge_key"], attrs)
+    )
+    return G
+
+
+class GraphStore:
+    """Persistent graph cache on disk, shared by every Streamlit worker pointed at the same directory"""
+
+    def __init__(self, root=None, max_bytes=None, offline=None, network_type="all"):
+        root = root or os.environ.get("MAP_ART_GRAPH_STORE", DEFAULT_ROOT)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("MAP_ART_GRAPH_STORE_MAX_MB", DEFAULT_MAX_MB)) * 1024 ** 2)
+        if offline is None:
+            offline = os.environ.get("MAP_ART_OFFLINE", "") not in ("", "0")
+        # Size cap of the whole store, each directory evicting within its share (BUDGET_SHARES)
+        self.max_bytes = max_bytes
+        self.cache = DiskLRU(root, int(max_bytes * BUDGET_SHARES["graphs"]), suffix=".npz")
+        try:
+            # Compact render networks built from the graphs, and area layers (see layers.py)
+            self.networks = DiskLRU(os.path.join(self.cache.root, "networks"),
+                                    int(max_bytes * BUDGET_SHARES["networks"]), suffix=".rnet")
+            self.layers = DiskLRU(os.path.join(self.cache.root, "layers"), int(max_bytes * BUDGET_SHARES["layers"]),
+                                  suffix=".npz")
+        except PermissionError:
+            # Read-only fixture directory: networks and layers are still built, just kept in memory only
+            self.networks = self.layers = None
+        self.offline = offline
+        self.network_type = network_type
+        # Imported here, with osmnx behind it, so that modules only needing GraphNotCached stay light
+        from map_art_app.large_area import LargeAreaFetcher
+
+        self.large_area = LargeAreaFetcher(network_type)
+
+    def place_key(self, place):
+        normalized = " ".join(place.lower().split())
+        slug = re.sub(r"[^a-z0-9]+", "-", normalized).strip("-")[:40]
+        digest = hashlib.sha1(normalized.encode()).hexdigest()[:12]
+        return f"place_{self.network_type}_{slug}_{digest}"
+
+    def source_key(self, source):
+        """Store key for a ("place", name) or ("bbox", (left, bottom, right, top)) source"""
+        kind, value = source
+        if kind == "place":
+            return self.place_key(value)
+        digest = hashlib.sha1(repr(tuple(round(v, 7) for v in value)).encode()).hexdigest()[:12]
+        return f"bbox_{self.network_type}_{digest}"
+
+    def load(self, key):
+        """Graph stored under key, or None on a miss"""
+        path = self.cache.get(key)
+        return load_graph(path) if path is not None else None
+
+    def save(self, key, G):
+        self.cache.put(key, lambda f: save_graph(G, f))
+
+    def get_or_fetch(self, key, fetch):
+        """Load a graph from disk, or call fetch() and persist the result"""
+        G = self.load(key)
+        if G is not None:
+            return G
+        if self.offline:
+            raise GraphNotCached(f"Graph '{key}' is not in the offline store at {self.cache.root}")
+        G = fetch()
+        self.save(key, G)
+        return G
+
+    def graph_from_place(self, place):
+        # Small places come from one ox.graph.graph_from_polygon call, metros cell by cell (see large_area)
+        return self.get_or_fetch(self.place_key(place), lambda: self.large_area.graph_from_place(place))
+
+    def network(self, key, build):
+        """RoadNetwork for the graph under key, memory-mapped from the store, or None if the graph has no roads
+
+        On a miss, build() returns the graph; its network is written once and every later call (in any process)
+        maps that file instead of decoding the graph.
+        """
+        key = f"{key}_v{NETWORK_VERSION}"
+        path = self.networks.get(key) if self.networks is not None else None
+        if path is not None:
+            try:
+                return load_network(path)
+            except FileNotFoundError:
+                # Evicted by another worker between the lookup and the open
+                pass
+        with METRICS.stage("network_build") as fields:
+            G = build()
+            if not G or not G.edges:
+                return None
+            network = RoadNetwork.from_graph(G)
+            fields.update(key=key, nodes=len(G), edges=G.number_of_edges(), bytes=network.nbytes)
+        METRICS.observe("graph_nodes", len(G))
+        METRICS.observe("graph_edges", G.number_of_edges())
+        if self.networks is not None:
+            try:
+                return load_network(self.networks.put(key, lambda f: save_network(network, f)))
+            except PermissionError:
+                # Read-only store, as in __init__
+                pass
+        return network
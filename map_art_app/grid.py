@@ -0,0 +1,204 @@
+"""Multi-city grid posters: one panel per place in a shared style, rendered in parallel and composited
+
+Every panel covers the same ground distance (radius_km each way from the place's center), so cities are shown at
+one scale. Panels are rendered by worker processes straight to RGBA tiles on disk at their final pixel size; the
+poster is then streamed out strip by strip from those memory-mapped tiles, so the parent never holds it whole.
+"""
+import math
+import os
+import tempfile
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import to_rgb, to_rgba
+from matplotlib.figure import Figure
+
+from map_art_app.batch import _write_atomic, download_source, network_for_source
+from map_art_app.export import PRINT_SIZES, STRIP_ROWS, print_size_pixels, render_strips, write_png
+from map_art_app.geocode import GeocodeCache
+from map_art_app.graph_store import GraphStore
+from map_art_app.presets import preset_style
+from map_art_app.tiles import TiledGraphCache
+
+DEFAULT_RADIUS_KM = 3.0
+KM_PER_DEG_LAT = 110.574
+KM_PER_DEG_LON = 111.320
+# Gutter between panels and around the grid, as a fraction of the poster's shorter side
+GUTTER = 0.03
+# Title band above each panel, as a fraction of the panel side
+TITLE = 0.15
+
+Panel = namedtuple("Panel", "title source")
+# Poster size in pixels, panel side, title band height, and the top-left corner of each panel's title band
+Layout = namedtuple("Layout", "width height panel title cells")
+
+
+def panel_bbox(lat, lon, radius_km):
+    """(left, bottom, right, top) reaching radius_km on the ground from (lat, lon) in each direction"""
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlon = radius_km / (KM_PER_DEG_LON * math.cos(math.radians(lat)))
+    return lon - dlon, lat - dlat, lon + dlon, lat + dlat
+
+
+def grid_panels(spec, geocode=None):
+    """Panels of a grid spec in poster order; "places" entries are names or {"place"/"center", "name", "radius_km"}"""
+    panels = []
+    for area in spec["places"]:
+        if isinstance(area, str):
+            area = {"place": area}
+        if "center" in area:
+            lat, lon = area["center"]
+        else:
+            geocode = geocode or GeocodeCache()
+            found = geocode.resolve(area["place"], focus_downtown=area.get("downtown", True))
+            if found is None:
+                raise ValueError(f"Could not find coordinates for '{area['place']}'")
+            lat, lon, _ = found
+        title = area.get("name") or area.get("place", "").split(",")[0]
+        radius_km = area.get("radius_km", spec.get("radius_km", DEFAULT_RADIUS_KM))
+        panels.append(Panel(title.upper(), ("bbox", panel_bbox(lat, lon, radius_km))))
+    return panels
+
+
+def grid_layout(count, columns, width_px, height_px, titles=True):
+    """Largest square panels that fit count panels in columns on the poster, centered with even gutters"""
+    rows = math.ceil(count / columns)
+    gutter = round(min(width_px, height_px) * GUTTER)
+    band = TITLE if titles else 0
+    panel = int(min((width_px - gutter * (columns + 1)) / columns,
+                    (height_px - gutter * (rows + 1)) / (rows * (1 + band))))
+    title = round(panel * band)
+    x0 = (width_px - columns * panel - (columns - 1) * gutter) // 2
+    y0 = (height_px - rows * (panel + title) - (rows - 1) * gutter) // 2
+    cells = [(x0 + (i % columns) * (panel + gutter), y0 + (i // columns) * (panel + title + gutter))
+             for i in range(count)]
+    return Layout(width_px, height_px, panel, title, cells)
+
+
+def title_color(background_color):
+    """White titles on dark backgrounds, near-black ones on light or transparent backgrounds"""
+    if background_color == "none":
+        return "#061529"
+    r, g, b = to_rgb(background_color)
+    return "#ffffff" if 0.2126 * r + 0.7152 * g + 0.0722 * b < 0.5 else "#061529"
+
+
+def title_band(title, width_px, height_px, background_color, dpi=300):
+    """(height_px, width_px, 4) RGBA band with the title centered in heavy capitals"""
+    fig = Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi, facecolor=background_color)
+    canvas = FigureCanvasAgg(fig)
+    # Font size in points filling about half the band
+    fig.text(0.5, 0.45, title, ha="center", va="center", color=title_color(background_color),
+             fontsize=height_px * 0.5 / dpi * 72, fontweight="heavy")
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba())[:height_px, :width_px]
+
+
+# Set in each worker process by _init_worker; networks come only from the store the parent already filled
+_worker_tiles = None
+
+
+def _init_worker(store_root, max_bytes):
+    global _worker_tiles
+    _worker_tiles = TiledGraphCache(GraphStore(store_root, max_bytes, offline=True))
+
+
+def render_panel(panel, layout, style, dpi, path):
+    """Render one panel (title band, then map) into an .npy RGBA tile at path; returns timings in seconds"""
+    start = time.perf_counter()
+    network = network_for_source(panel.source, _worker_tiles)
+    if network is None:
+        raise ValueError(f"No road data for {panel.title}")
+    prepared = time.perf_counter()
+
+    side, title = layout.panel, layout.title
+    tile = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(title + side, side, 4))
+    if title:
+        tile[:title] = title_band(panel.title, side, title, style[2], dpi)
+    row = title
+    for strip in render_strips(network, network.classes, style, side, side, dpi, bounds=panel.source[1]):
+        tile[row:row + len(strip)] = strip
+        row += len(strip)
+    tile.flush()
+    end = time.perf_counter()
+    return {"network": prepared - start, "render": end - prepared, "total": end - start, "pid": os.getpid()}
+
+
+def compose_strips(layout, tiles, background_color, strip_rows=STRIP_ROWS):
+    """Yield the poster as (rows, width, 4) strips: background, with the overlapping rows of each tile pasted in"""
+    fill = np.array([round(c * 255) for c in to_rgba(background_color)], dtype=np.uint8)
+    for top in range(0, layout.height, strip_rows):
+        rows = min(strip_rows, layout.height - top)
+        strip = np.empty((rows, layout.width, 4), dtype=np.uint8)
+        strip[:] = fill
+        for (x, y), tile in zip(layout.cells, tiles):
+            a, b = max(top, y), min(top + rows, y + len(tile))
+            if a < b:
+                strip[a - top:b - top, x:x + tile.shape[1]] = tile[a - y:b - y]
+        yield strip
+
+
+def run_grid(spec, out_path, workers=None, store=None, geocode=None, log=print):
+    """Render a grid spec into a PNG poster at out_path; returns a summary dict
+
+    A spec is {"places": [...], "columns": 3, "preset": "Midnight", "size": "24 x 36 in", "dpi": 300,
+    "radius_km": 3, "titles": true}; everything but "places" is optional.
+    """
+    store = store or GraphStore()
+    started = time.perf_counter()
+    panels = grid_panels(spec, geocode)
+    size = spec.get("size", "24 x 36 in")
+    if size not in PRINT_SIZES:
+        raise ValueError(f"Unknown print size '{size}'; choose from {', '.join(PRINT_SIZES)}")
+    dpi = spec.get("dpi", 300)
+    style = preset_style(spec.get("preset", "None"), show_legend=False, transparent=spec.get("transparent", False))
+    columns = spec.get("columns") or math.ceil(math.sqrt(len(panels)))
+    layout = grid_layout(len(panels), columns, *print_size_pixels(*PRINT_SIZES[size], dpi), spec.get("titles", True))
+    summary = {"panels": len(panels), "failed": {}, "downloads": 0, "panel_px": layout.panel}
+    log(f"{len(panels)} panels of {layout.panel} px in {columns} columns on a {layout.width} x {layout.height} poster")
+
+    # As in run_batch: downloads happen here, serially; workers only read the store
+    tiles = TiledGraphCache(store)
+    for panel in panels:
+        try:
+            summary["downloads"] += download_source(panel.source, tiles)
+        except Exception as e:
+            summary["failed"][panel.title] = str(e)
+    summary["fetch_seconds"] = time.perf_counter() - started
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".grid-") as tmp:
+        paths = [os.path.join(tmp, f"panel-{i}.npy") for i in range(len(panels))]
+        init_args = (store.cache.root, store.max_bytes)
+        rendering = time.perf_counter()
+        with ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init_worker, initargs=init_args) as pool:
+            futures = {pool.submit(render_panel, panel, layout, style, dpi, path): panel
+                       for panel, path in zip(panels, paths) if panel.title not in summary["failed"]}
+            for future in as_completed(futures):
+                panel = futures[future]
+                try:
+                    timings = future.result()
+                    log(f"{panel.title}  network {timings['network']:.2f}s  render {timings['render']:.2f}s")
+                except Exception as e:
+                    summary["failed"][panel.title] = str(e)
+        summary["render_seconds"] = time.perf_counter() - rendering
+
+        if summary["failed"]:
+            for title, error in summary["failed"].items():
+                log(f"{title} failed: {error}")
+            log("poster not written")
+        else:
+            composing = time.perf_counter()
+            tiles = [np.load(path, mmap_mode="r") for path in paths]
+            _write_atomic(out_path, "wb", lambda f: write_png(f, layout.width, layout.height,
+                                                             compose_strips(layout, tiles, style[2])))
+            summary["compose_seconds"] = time.perf_counter() - composing
+
+    summary["seconds"] = time.perf_counter() - started
+    if not summary["failed"]:
+        log(f"{out_path}: {summary['seconds']:.1f}s ({summary['fetch_seconds']:.1f}s fetching, "
+            f"{summary['render_seconds']:.1f}s rendering panels, {summary['compose_seconds']:.1f}s compositing)")
+    return summary
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from map_art_app.metrics import record_job, rss_bytes
+
+# Stages a render job reports, in order; progress is the fraction of stages already started
+STAGES = ["queued", "fetching", "layers", "previewing", "drawing", "encoding"]
+DEFAULT_WORKERS = 4
+# Finished jobs kept around for sessions that have not picked up their result yet
+FINISHED_JOBS = 64
+
+
+class JobCancelled(Exception):
+    """Raised inside a job at its next stage boundary once every session waiting on it has moved on"""
+
+
+class RenderJob:
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.stage = "queued"
+        self.result = None
+        self.error = None
+        # Quick low-resolution render shown until the full one is ready
+        self.preview = None
+        # Seconds from submission to the start of each stage, to the preview and to the finished result
+        self.timings = {}
+        self.started = time.perf_counter()
+        # (stage, seconds since submission, resident bytes) at the start of each stage, then once more at the end
+        self.checkpoints = []
+        self._checkpoint("queued")
+        # Sizes and outcomes the work reports about itself (edges drawn, PNG bytes...), recorded with the timings
+        self.info = {}
+        self.sessions = set()
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.future = None
+
+    @property
+    def progress(self):
+        return STAGES.index(self.stage) / len(STAGES)
+
+    @property
+    def status(self):
+        if not self.done.is_set():
+            return "running" if self.stage != "queued" else "queued"
+        if self.cancelled.is_set():
+            return "cancelled"
+        return "failed" if self.error is not None else "done"
+
+    def _checkpoint(self, stage):
+        seconds = time.perf_counter() - self.started
+        self.checkpoints.append((stage, seconds, rss_bytes()))
+        return seconds
+
+    def set_stage(self, stage):
+        """Checkpoint between stages: records progress, or stops the job if nobody is waiting for it any more"""
+        if self.cancelled.is_set():
+            raise JobCancelled(self.id)
+        self.stage = stage
+        self.timings[stage] = self._checkpoint(stage)
+
+    def stage_metrics(self):
+        """{stage: {"seconds", "rss_delta"}} for every stage the job has finished, in order"""
+        stages = {}
+        for (stage, start, rss), (_, end, next_rss) in zip(self.checkpoints, self.checkpoints[1:]):
+            delta = next_rss - rss if rss is not None and next_rss is not None else None
+            stages[stage] = {"seconds": round(end - start, 4), "rss_delta": delta}
+        return stages
+
+    def set_preview(self, png):
+        self.preview = png
+        self.timings["preview"] = time.perf_counter() - self.started
+
+
+class JobManager:
+    """Process-wide pool running map renders off the script thread, shared by every session
+
+    Identical in-flight requests (same key) from any session attach to the same job instead of starting another.
+    """
+
+    def __init__(self, max_workers=None):
+        max_workers = max_workers or int(os.environ.get("MAP_ART_RENDER_WORKERS", DEFAULT_WORKERS))
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="map-render")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._inflight = {}
+
+    def submit(self, key, session_id, work):
+        """Start work(job) for key, or join the job already running for it; returns the job"""
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is None or job.cancelled.is_set():
+                job = RenderJob(key)
+                self._inflight[key] = job
+                self._jobs[job.id] = job
+                job.future = self._pool.submit(self._run, job, work)
+            job.sessions.add(session_id)
+            return job
+
+    def _run(self, job, work):
+        try:
+            job.result = work(job)
+            job.timings["full"] = time.perf_counter() - job.started
+        except JobCancelled:
+            pass
+        except Exception as e:
+            job.error = e
+        finally:
+            with self._lock:
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+                finished = [job_id for job_id, j in self._jobs.items() if j.done.is_set()]
+                for job_id in finished[:max(0, len(finished) + 1 - FINISHED_JOBS)]:
+                    del self._jobs[job_id]
+            job._checkpoint("end")
+            job.done.set()
+        record_job(job)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id, session_id):
+        """Detach a session from a job; the job stops once no session is waiting on it"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done.is_set():
+                return
+            job.sessions.discard(session_id)
+            if job.sessions:
+                return
+            job.cancelled.set()
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            if not job.future.cancel():
+                # Running: it stops at its next stage and _run marks it finished
+                return
+            # Never started, so _run will not mark it finished or record it
+            del self._jobs[job_id]
+            job._checkpoint("end")
+            job.done.set()
+        record_job(job)
@@ -0,0 +1,253 @@
+"""Large-area mode for place graphs: split the place polygon into cells, fetch and simplify them concurrently, merge
+
+Fetching a whole metro (Los Angeles, Greater London) in one Overpass query is slow, memory-heavy and prone to time
+out. Here each cell is a separate, throttled request, simplified as soon as it arrives so only simplified pieces are
+held at once. Nodes on cell borders are kept through simplification and joined back up after the merge, so the
+result matches a one-shot fetch edge for edge (edge lengths drive the road classes).
+
+The fetch layer is any callable fetch(polygon, network_type) returning an unsimplified graph that keeps edges
+crossing the polygon border: the default goes to Overpass (ox.settings.overpass_url, so a local Overpass instance
+works too) and GraphFixture serves a saved graph instead.
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import shapely
+from shapely.geometry import LineString, box
+
+try:
+    import resource
+except ImportError:  # Windows: peak memory is not reported
+    resource = None
+
+# Cell edge in degrees (~5 km)
+CELL_SIZE = 0.05
+# Places whose polygon covers more than this many square degrees (~150 km² at mid latitudes) are fetched by cell
+LARGE_AREA = 0.02
+DEFAULT_WORKERS = 4
+# Minimum seconds between the starts of two cell requests, across all workers
+DEFAULT_INTERVAL = 1.0
+# Cells cover the place plus this margin in degrees (~500 m, like ox.graph.graph_from_polygon's buffer), so streets
+# leaving and re-entering the place between two cells are still whole when the result is truncated to it
+MARGIN = 0.005
+BORDER_ATTR = "_cell_border"
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far in MB, or None where the platform does not report it"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def place_polygon(place):
+    """Boundary (Multi)Polygon of a place, as ox.graph.graph_from_place resolves it"""
+    return ox.geocode_to_gdf(place).union_all()
+
+
+def fetch_raw_polygon(polygon, network_type="all"):
+    """Unsimplified network inside polygon, keeping edges that cross its border so cells stitch together"""
+    try:
+        return ox.graph.graph_from_polygon(polygon, network_type=network_type, simplify=False, retain_all=True,
+                                           truncate_by_edge=True)
+    except (ox._errors.InsufficientResponseError, ValueError):
+        # Water, parks, etc.
+        return nx.MultiDiGraph(crs=ox.settings.default_crs)
+
+
+class GraphFixture:
+    """Fetch layer serving cells out of one unsimplified graph (e.g. a fixture file read with load_graph)"""
+
+    def __init__(self, graph, latency=0.0):
+        self.graph = graph
+        # Seconds each request takes, to stand in for a real server
+        self.latency = latency
+        self.requests = 0
+        self._nodes = np.array(graph.nodes)
+        self._xy = np.array([(d["x"], d["y"]) for _, d in graph.nodes(data=True)]).reshape(-1, 2)
+
+    def __call__(self, polygon, network_type="all"):
+        """Nodes inside polygon plus their neighbours, like truncate_graph_polygon(truncate_by_edge=True)"""
+        self.requests += 1
+        time.sleep(self.latency)
+        left, bottom, right, top = polygon.bounds
+        x, y = self._xy[:, 0], self._xy[:, 1]
+        near = (x >= left) & (x <= right) & (y >= bottom) & (y <= top)
+        inside = self._nodes[near][shapely.intersects_xy(polygon, x[near], y[near])].tolist()
+        keep = set(inside)
+        for node in inside:
+            keep.update(self.graph.successors(node))
+            keep.update(self.graph.predecessors(node))
+        return self.graph.subgraph(keep).copy()
+
+
+class Throttle:
+    """Spaces out calls from any number of threads so that no two start within interval seconds"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def subdivide(polygon, cell_size=CELL_SIZE):
+    """(part of polygon, grid box bounds) for every grid cell of cell_size degrees that polygon overlaps"""
+    left, bottom, right, top = polygon.bounds
+    cells = []
+    for col in range(math.floor(left / cell_size), math.ceil(right / cell_size)):
+        for row in range(math.floor(bottom / cell_size), math.ceil(top / cell_size)):
+            bounds = (col * cell_size, row * cell_size, (col + 1) * cell_size, (row + 1) * cell_size)
+            part = polygon.intersection(box(*bounds))
+            if not part.is_empty and part.area > 0:
+                cells.append((part, bounds))
+    return cells
+
+
+def simplify_cell(G, bounds):
+    """Simplify one cell's graph, keeping nodes outside the cell and their neighbours so the border can be rejoined
+
+    A cell owns the nodes in [left, right) x [bottom, top): a node exactly on a grid line belongs to one cell only,
+    so no chain is simplified twice.
+    """
+    if not len(G):
+        return G
+    left, bottom, right, top = bounds
+    nodes = np.array(G.nodes)
+    xy = np.array([(d["x"], d["y"]) for _, d in G.nodes(data=True)])
+    inside = (xy[:, 0] >= left) & (xy[:, 0] < right) & (xy[:, 1] >= bottom) & (xy[:, 1] < top)
+    outside = set(nodes[~inside].tolist())
+    border = set(outside)
+    for node in outside:
+        border.update(G.successors(node))
+        border.update(G.predecessors(node))
+    # Edges between two nodes outside the cell belong to a neighbouring cell
+    G.remove_edges_from([(u, v, k) for u, v, k in G.edges(keys=True) if u in outside and v in outside])
+    G.remove_nodes_from([node for node in outside if G.degree(node) == 0])
+    nx.set_node_attributes(G, {node: True for node in border if node in G}, name=BORDER_ATTR)
+    return ox.simplify_graph(G, node_attrs_include=[BORDER_ATTR])
+
+
+def _edge_coords(G, u, v, data):
+    if "geometry" in data:
+        return list(data["geometry"].coords)
+    return [(G.nodes[u]["x"], G.nodes[u]["y"]), (G.nodes[v]["x"], G.nodes[v]["y"])]
+
+
+def _flatten(value):
+    return value if isinstance(value, list) else [value]
+
+
+def join_border_nodes(G, border):
+    """Finish simplification across cell borders: merge the edges through every border node that turns out to be
+    interstitial, the way ox.simplify_graph would have on the whole graph; returns how many nodes were removed
+
+    Paths are found with osmnx's own walk (rings included). Their edges are already partly simplified, so
+    geometries are concatenated rather than rebuilt from node positions.
+    """
+    interstitial = {node for node in border
+                    if node in G and not ox.simplification._is_endpoint(G, node, None, None)}
+    endpoints = set(G.nodes) - interstitial
+    starts = {n for node in interstitial for n in G.predecessors(node)} & endpoints
+    paths = [ox.simplification._build_path(G, start, successor, endpoints)
+             for start in starts for successor in G.successors(start) if successor in interstitial]
+
+    for path in paths:
+        values, coords = {}, []
+        for u, v in zip(path, path[1:]):
+            # Like ox.simplify_graph, only one of any parallel edges along the path is kept
+            data = next(iter(G.get_edge_data(u, v).values()))
+            for attr, value in data.items():
+                if attr != "geometry":
+                    values.setdefault(attr, []).extend(_flatten(value))
+            coords.extend(_edge_coords(G, u, v, data)[1 if coords else 0:])
+        attrs = {attr: list(set(vals)) if len(set(vals)) > 1 else vals[0] for attr, vals in values.items()}
+        attrs["length"] = sum(values.get("length", []))
+        attrs["geometry"] = LineString(coords)
+        G.add_edge(path[0], path[-1], **attrs)
+    G.remove_nodes_from(interstitial)
+    return len(interstitial)
+
+
+class LargeAreaFetcher:
+    """Place graphs for areas too big for one Overpass query; see the module docstring"""
+
+    def __init__(self, network_type="all", cell_size=None, workers=None, interval=None, large_area=LARGE_AREA,
+                 fetch=fetch_raw_polygon, geocode=place_polygon):
+        self.network_type = network_type
+        self.cell_size = cell_size or float(os.environ.get("MAP_ART_AREA_CELL", CELL_SIZE))
+        self.workers = workers or int(os.environ.get("MAP_ART_FETCH_WORKERS", DEFAULT_WORKERS))
+        if interval is None:
+            interval = float(os.environ.get("MAP_ART_FETCH_INTERVAL", DEFAULT_INTERVAL))
+        self.throttle = Throttle(interval)
+        self.large_area = large_area
+        self.fetch = fetch
+        self.geocode = geocode
+        # Cells, timings and peak memory of the most recent large-area fetch
+        self.last_stats = None
+
+    def graph_from_place(self, place):
+        """Same result as ox.graph.graph_from_place(place), fetched cell by cell when the place is large"""
+        polygon = self.geocode(place)
+        if polygon.area <= self.large_area:
+            return ox.graph.graph_from_polygon(polygon, network_type=self.network_type)
+        return self.graph_from_polygon(polygon)
+
+    def _fetch_cell(self, cell, bounds):
+        self.throttle.wait()
+        start = time.perf_counter()
+        G = self.fetch(cell, self.network_type)
+        fetched = time.perf_counter()
+        G = simplify_cell(G, bounds)
+        return G, fetched - start, time.perf_counter() - fetched
+
+    def graph_from_polygon(self, polygon):
+        """Fetch the cells of polygon on the worker pool, merging each simplified cell as it arrives"""
+        start = time.perf_counter()
+        cells = subdivide(polygon.buffer(MARGIN), self.cell_size)
+        merged = nx.MultiDiGraph(crs=ox.settings.default_crs)
+        fetch_seconds = simplify_seconds = 0.0
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="area-fetch") as pool:
+            for future in as_completed([pool.submit(self._fetch_cell, *cell) for cell in cells]):
+                G, fetched, simplified = future.result()
+                fetch_seconds += fetched
+                simplify_seconds += simplified
+                # Edges on a cell border come back from both cells with the same (u, v, key): added once
+                merged.add_nodes_from(G.nodes(data=True))
+                merged.add_edges_from(G.edges(keys=True, data=True))
+        merging = time.perf_counter()
+
+        # Joined before truncating to the place, as ox.graph.graph_from_polygon simplifies before it truncates
+        border = [node for node, flag in merged.nodes(data=BORDER_ATTR) if flag]
+        joined = join_border_nodes(merged, border)
+        for node in border:
+            if node in merged:
+                del merged.nodes[node][BORDER_ATTR]
+        try:
+            G = ox.truncate.truncate_graph_polygon(merged, polygon)
+        except ValueError:
+            raise ox._errors.InsufficientResponseError(f"No street network found inside {polygon.bounds}")
+        G = ox.truncate.largest_component(G)
+        # Counted before truncation so intersections on the place border keep their streets outside it
+        nx.set_node_attributes(G, ox.stats.count_streets_per_node(merged, nodes=G.nodes), name="street_count")
+        G.graph["simplified"] = True
+
+        self.last_stats = {
+            "cells": len(cells), "workers": self.workers, "nodes": len(G), "edges": G.number_of_edges(),
+            "border_nodes_joined": joined, "fetch_seconds": round(fetch_seconds, 2),
+            "simplify_seconds": round(simplify_seconds, 2), "merge_seconds": round(time.perf_counter() - merging, 2),
+            "seconds": round(time.perf_counter() - start, 2), "peak_rss_mb": peak_rss_mb(),
+        }
+        return G
@@ -0,0 +1,211 @@
+"""Area layers drawn under the streets: land use, parks, water and buildings
+
+All the layers a map asks for are fetched in one Overpass query (the union of their tags, so a feature matching
+several is downloaded once) and then split per layer. Each layer is stored on its own per bbox, so toggling one never
+refetches the others, and a feature is kept by every layer whose tags it matches: a stored layer is the same no
+matter which other layers were requested with it.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+
+from map_art_app.graph_store import GraphNotCached
+
+# Drawing order, bottom to top; streets are drawn over all of them
+LAYERS = {
+    "landuse": {"tags": {"landuse": ["residential", "commercial", "industrial", "retail", "railway"]},
+                "color": "#1b2a3d"},
+    "parks": {"tags": {"leisure": ["park", "garden", "nature_reserve", "pitch", "golf_course"],
+                       "landuse": ["grass", "forest", "meadow", "recreation_ground", "cemetery"],
+                       "natural": ["wood", "scrub", "heath"]},
+              "color": "#1f3d2b"},
+    "water": {"tags": {"natural": ["water", "bay", "wetland"], "water": True, "waterway": ["riverbank", "dock"]},
+              "color": "#0f3a5f"},
+    "buildings": {"tags": {"building": True}, "color": "#2e2e38"},
+}
+# Layers decoded in memory per process on top of the on-disk store
+MEMORY_LAYERS = 32
+
+
+def combined_tags(names):
+    """One ox.features tags dict asking for every feature any of the named layers needs"""
+    tags = {}
+    for name in names:
+        for key, values in LAYERS[name]["tags"].items():
+            if values is True or tags.get(key) is True:
+                tags[key] = True
+            else:
+                tags[key] = sorted(set(tags.get(key, [])) | set(values))
+    return tags
+
+
+def fetch_features(bbox, tags):
+    """OSM features inside a (left, bottom, right, top) bbox as a GeoDataFrame, or None if there are none"""
+    import osmnx as ox
+
+    try:
+        return ox.features.features_from_bbox(bbox, tags)
+    except ox._errors.InsufficientResponseError:
+        return None
+
+
+def _ranges(starts, ends):
+    """Concatenated np.arange(start, end) for every pair"""
+    counts = ends - starts
+    first = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=first[1:])
+    return np.repeat(starts - first[:-1], counts) + np.arange(first[-1])
+
+
+class PolygonLayer:
+    """Polygons as one flat (N, 2) vertex buffer plus ring and polygon offsets, like EdgeGeometry for edges
+
+    Ring i is vertices[ring_offsets[i]:ring_offsets[i + 1]] and polygon j is rings
+    polygon_offsets[j]:polygon_offsets[j + 1], exterior first. Exteriors run counter-clockwise and holes clockwise,
+    so the nonzero fill rule leaves holes empty.
+    """
+
+    def __init__(self, vertices, ring_offsets, polygon_offsets):
+        self.vertices = vertices
+        self.ring_offsets = ring_offsets
+        self.polygon_offsets = polygon_offsets
+        self._codes = None
+        self._fingerprint = None
+
+    @classmethod
+    def from_geometries(cls, geoms):
+        """Build from any shapely geometries, keeping only their polygon parts"""
+        parts = shapely.get_parts(np.asarray(geoms, dtype=object))
+        polygons = parts[(shapely.get_type_id(parts) == 3) & ~shapely.is_empty(parts)]
+        if not len(polygons):
+            return cls(np.empty((0, 2)), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
+        _, coords, (ring_offsets, polygon_offsets) = shapely.to_ragged_array(shapely.orient_polygons(polygons))
+        return cls(coords, ring_offsets.astype(np.int64), polygon_offsets.astype(np.int64))
+
+    def __len__(self):
+        return len(self.polygon_offsets) - 1
+
+    def y_extents(self):
+        """(ymin, ymax) arrays per polygon"""
+        starts = self.ring_offsets[self.polygon_offsets[:-1]]
+        ys = self.vertices[:, 1]
+        return np.minimum.reduceat(ys, starts), np.maximum.reduceat(ys, starts)
+
+    def path(self, polygons=None):
+        """One compound matplotlib Path for all polygons (or the given polygon indices), filled in a single draw"""
+        from matplotlib.path import Path
+
+        if self._codes is None:
+            codes = np.full(len(self.vertices), Path.LINETO, dtype=Path.code_type)
+            codes[self.ring_offsets[:-1]] = Path.MOVETO
+            codes[self.ring_offsets[1:] - 1] = Path.CLOSEPOLY
+            self._codes = codes
+        if polygons is None:
+            return Path(self.vertices, self._codes)
+        index = _ranges(self.ring_offsets[self.polygon_offsets[polygons]],
+                        self.ring_offsets[self.polygon_offsets[polygons + 1]])
+        return Path(self.vertices[index], self._codes[index])
+
+    def fingerprint(self):
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            for array in (self.polygon_offsets, self.ring_offsets, self.vertices):
+                digest.update(array.tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+
+def split_layers(features, names, bbox):
+    """{name: PolygonLayer} from one combined query: each layer gets every polygon matching its tags, clipped to bbox"""
+    if features is None or not len(features):
+        return {name: PolygonLayer.from_geometries([]) for name in names}
+    geoms = np.asarray(features.geometry.array, dtype=object)
+    layers = {}
+    for name in names:
+        mask = np.zeros(len(features), dtype=bool)
+        for key, values in LAYERS[name]["tags"].items():
+            if key in features:
+                column = features[key]
+                mask |= (column.notna() if values is True else column.isin(values)).to_numpy()
+        layers[name] = PolygonLayer.from_geometries(shapely.clip_by_rect(geoms[mask], *bbox))
+    return layers
+
+
+def layer_fingerprint(fingerprint, layers):
+    """Network fingerprint extended with the drawn layers and their colors; unchanged when there are none"""
+    if not layers:
+        return fingerprint
+    spec = "|".join([fingerprint] + [f"{name}:{color}:{layer.fingerprint()}" for name, layer, color in layers])
+    return hashlib.sha1(spec.encode()).hexdigest()
+
+
+def _save_layer(layer, f):
+    np.savez(f, vertices=layer.vertices, ring_offsets=layer.ring_offsets, polygon_offsets=layer.polygon_offsets)
+
+
+def _load_layer(path):
+    with np.load(path, allow_pickle=False) as z:
+        return PolygonLayer(z["vertices"], z["ring_offsets"], z["polygon_offsets"])
+
+
+class LayerCache:
+    """Per-bbox, per-layer cache in the graph store's layers/ directory; misses are fetched together"""
+
+    def __init__(self, store, fetch=fetch_features):
+        self.store = store
+        self.fetch = fetch
+        self.fetches = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def layer_key(bounds, name):
+        digest = hashlib.sha1(repr(tuple(round(float(v), 7) for v in bounds)).encode()).hexdigest()[:12]
+        return f"{name}_{digest}"
+
+    def _remember(self, key, layer):
+        with self._lock:
+            self._memory[key] = layer
+            self._memory.move_to_end(key)
+            if len(self._memory) > MEMORY_LAYERS:
+                self._memory.popitem(last=False)
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        path = self.store.layers.get(key) if self.store.layers is not None else None
+        if path is None:
+            return None
+        try:
+            layer = _load_layer(path)
+        except FileNotFoundError:
+            # Evicted by another worker between the lookup and the read
+            return None
+        self._remember(key, layer)
+        return layer
+
+    def layers(self, bounds, names):
+        """{name: PolygonLayer} inside a (left, bottom, right, top) bbox; the missing ones come from one query"""
+        keys = {name: self.layer_key(bounds, name) for name in names}
+        found = {name: self._cached(key) for name, key in keys.items()}
+        missing = [name for name, layer in found.items() if layer is None]
+        if missing:
+            if self.store.offline:
+                raise GraphNotCached(f"Layers {missing} are not in the offline store at {self.store.cache.root}")
+            self.fetches += 1
+            fetched = split_layers(self.fetch(bounds, combined_tags(missing)), missing, bounds)
+            for name, layer in fetched.items():
+                if self.store.layers is not None:
+                    self.store.layers.put(keys[name], lambda f: _save_layer(layer, f))
+                self._remember(keys[name], layer)
+            found.update(fetched)
+        return found
+
+    def stats(self):
+        total = self.store.layers.total_bytes() if self.store.layers is not None else 0
+        return {"fetches": self.fetches, "in_memory": len(self._memory), "bytes": total}
@@ -0,0 +1,191 @@
+"""Render metrics for this process: stage timings and memory, map and output sizes, cache hit rates
+
+Every finished render job and every export is recorded: how long each stage took, how much resident memory the
+process gained meanwhile (process-wide, so concurrent jobs share the blame), how big the drawn network was and how
+many bytes came out. Totals are kept in memory for the app's debug panel, each event is also logged as one JSON line
+on the "map_art_app.metrics" logger, and the totals can be rewritten as Prometheus text after every event for a
+node_exporter textfile collector or any dashboard that scrapes files.
+
+- MAP_ART_METRICS_LOG: append the JSON lines to this file as well
+- MAP_ART_METRICS_FILE: Prometheus text file, rewritten atomically; "{pid}" in it is replaced by the process id so
+  several Streamlit workers can each write their own
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: no peak memory fallback either
+    resource = None
+
+PREFIX = "map_art_"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+LOG = logging.getLogger("map_art_app.metrics")
+
+
+def rss_bytes():
+    """Resident memory of this process, the peak so far where /proc is not available (macOS), or None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        if resource is None:
+            return None
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _series(name, labels):
+    if not labels:
+        return PREFIX + name
+    return PREFIX + name + "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Thread-safe counters, summaries (count/sum/max) and cache collectors, exported as a dict or Prometheus text"""
+
+    def __init__(self, prometheus_path=None):
+        if prometheus_path is None:
+            prometheus_path = os.environ.get("MAP_ART_METRICS_FILE") or None
+        self.prometheus_path = prometheus_path and prometheus_path.format(pid=os.getpid())
+        self.counters = {}
+        self.summaries = {}
+        self.collectors = {}
+        self.last = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            count, total, peak = self.summaries.get(key, (0, 0, value))
+            self.summaries[key] = (count + 1, total + value, max(peak, value))
+
+    def add_collector(self, name, stats):
+        """Report stats() (e.g. a cache's {"hits", "misses", ...}) as gauges labelled cache=name on every export"""
+        self.collectors[name] = stats
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """Time a block and its resident memory delta; fields set on the yielded dict go into its JSON log line"""
+        fields = {}
+        rss, start = rss_bytes(), time.perf_counter()
+        yield fields
+        seconds = time.perf_counter() - start
+        self.observe("stage_seconds", seconds, stage=name, **labels)
+        event = {"seconds": round(seconds, 4)}
+        if rss is not None:
+            event["rss_delta"] = rss_bytes() - rss
+            self.observe("stage_rss_delta_bytes", event["rss_delta"], stage=name, **labels)
+        self.event(name, **labels, **event, **fields)
+
+    def event(self, name, **fields):
+        """Log one JSON line for an event, keep it as the last of its kind and refresh the Prometheus file"""
+        record = {"event": name, "time": round(time.time(), 3), "pid": os.getpid(), **fields}
+        with self._lock:
+            self.last[name] = record
+        LOG.info(json.dumps(record, default=str))
+        self.write_prometheus()
+
+    def _cache_gauges(self):
+        gauges = {}
+        for cache, stats in list(self.collectors.items()):
+            values = stats()
+            for field, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[(f"cache_{field}", (("cache", cache),))] = value
+            lookups = values.get("hits", 0) + values.get("misses", 0)
+            if lookups:
+                gauges[("cache_hit_ratio", (("cache", cache),))] = values["hits"] / lookups
+        return gauges
+
+    def snapshot(self):
+        """Everything recorded so far as plain dicts, for the debug panel"""
+        with self._lock:
+            counters, summaries, last = dict(self.counters), dict(self.summaries), dict(self.last)
+        stages = {}
+        for (name, labels), (count, total, peak) in summaries.items():
+            stages[_series(name, labels)[len(PREFIX):]] = {"count": count, "mean": total / count, "max": peak}
+        return {"counters": {_series(*key)[len(PREFIX):]: value for key, value in counters.items()},
+                "summaries": stages, "caches": {name: stats() for name, stats in list(self.collectors.items())},
+                "resident_bytes": rss_bytes(), "last": last}
+
+    def prometheus_text(self):
+        """Prometheus text exposition format of every counter, summary and cache gauge"""
+        with self._lock:
+            counters, summaries = dict(self.counters), dict(self.summaries)
+        lines, typed = [], set()
+
+        def add(name, kind, labels, value, suffix=""):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            lines.append(f"{_series(name + suffix, labels)} {value:.10g}")
+
+        for (name, labels), value in sorted(counters.items()):
+            add(name, "counter", labels, value)
+        for (name, labels), (count, total, peak) in sorted(summaries.items()):
+            add(name, "summary", labels, count, "_count")
+            add(name, "summary", labels, total, "_sum")
+            add(name + "_max", "gauge", labels, peak)
+        for (name, labels), value in sorted(self._cache_gauges().items()):
+            add(name, "gauge", labels, value)
+        rss = rss_bytes()
+        if rss is not None:
+            add("resident_bytes", "gauge", (), rss)
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        if not self.prometheus_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.prometheus_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".prom")
+            with os.fdopen(fd, "w") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, self.prometheus_path)
+        except OSError as e:
+            # Metrics must never fail a render
+            LOG.warning("could not write %s: %s", self.prometheus_path, e)
+
+
+def _log_to_file():
+    path = os.environ.get("MAP_ART_METRICS_LOG")
+    if path and not LOG.handlers:
+        handler = logging.FileHandler(os.path.expanduser(path))
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        LOG.addHandler(handler)
+        LOG.setLevel(logging.INFO)
+
+
+_log_to_file()
+# Process-wide, like the pipeline's stage caches
+METRICS = Metrics()
+
+
+def record_job(job, metrics=METRICS):
+    """Record a finished RenderJob: per-stage timings and memory, outcome, and the sizes in job.info"""
+    stages = job.stage_metrics()
+    metrics.inc("jobs_total", status=job.status)
+    for stage, values in stages.items():
+        metrics.observe("stage_seconds", values["seconds"], stage=stage)
+        if values.get("rss_delta") is not None:
+            metrics.observe("stage_rss_delta_bytes", values["rss_delta"], stage=stage)
+    for name, value in job.info.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics.observe(f"render_{name}", value)
+    error = None if job.error is None else repr(job.error)
+    metrics.event("render", job=job.id, status=job.status, stages=stages, error=error, **job.info)
@@ -0,0 +1,81 @@
+"""Compact road networks: everything the render path needs of a street graph, in a handful of flat arrays
+
+A RoadNetwork is built once from the osmnx graph and the graph is then dropped; the file format is the arrays laid
+out back to back after a small JSON header, so load_network memory-maps them instead of reading them. Every process
+mapping the same file shares one copy of the pages.
+"""
+import json
+import struct
+
+import numpy as np
+
+from map_art_app.render import EdgeGeometry
+from map_art_app.roads import extract_graph_edges, road_classes
+
+# Bump when the layout or the road class rules change; stored networks are keyed on it
+NETWORK_VERSION = 1
+MAGIC = b"MAPNET%d\n" % NETWORK_VERSION
+# Arrays start on cache-line boundaries in the file, so mapped views are aligned for vectorized reads
+ALIGN = 64
+ARRAYS = ("vertices", "offsets", "lengths", "classes")
+
+
+class RoadNetwork(EdgeGeometry):
+    """Edge geometry plus float32 lengths (NaN if missing) and uint8 road class codes, all indexed by edge
+
+    Accepted anywhere an EdgeGeometry is, with network.classes as the matching class array.
+    """
+
+    def __init__(self, vertices, offsets, lengths, classes):
+        super().__init__(vertices, offsets)
+        self.lengths = lengths
+        self.classes = classes
+
+    @classmethod
+    def from_graph(cls, G):
+        geometry = EdgeGeometry.from_graph(G)
+        lengths, _, _, primary = extract_graph_edges(G)
+        # Classes come from the full-precision lengths, so they match classifying the graph directly
+        return cls(geometry.vertices, geometry.offsets, lengths.astype(np.float32), road_classes(lengths, primary))
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+
+def save_network(network, f):
+    """Write a RoadNetwork to a binary file object: magic, header length, JSON header, then the aligned arrays"""
+    arrays = [np.ascontiguousarray(getattr(network, name)) for name in ARRAYS]
+    entries, offset = [], 0
+    for name, array in zip(ARRAYS, arrays):
+        entries.append({"name": name, "dtype": array.dtype.str, "shape": array.shape, "offset": offset})
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps(entries).encode()
+    start = _aligned(len(MAGIC) + 8 + len(header))
+    f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+    f.write(b"\0" * (start - len(MAGIC) - 8 - len(header)))
+    written = 0
+    for entry, array in zip(entries, arrays):
+        f.write(b"\0" * (entry["offset"] - written))
+        f.write(array.tobytes())
+        written = entry["offset"] + array.nbytes
+
+
+def load_network(path):
+    """Map a file written by save_network; the arrays are read-only views into the page cache, nothing is copied"""
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a road network file")
+    (size,) = struct.unpack("<Q", bytes(buf[len(MAGIC):len(MAGIC) + 8]))
+    header_end = len(MAGIC) + 8 + size
+    start = _aligned(header_end)
+    arrays = {}
+    for entry in json.loads(bytes(buf[len(MAGIC) + 8:header_end])):
+        dtype, shape = np.dtype(entry["dtype"]), tuple(entry["shape"])
+        count = int(np.prod(shape))
+        arrays[entry["name"]] = np.frombuffer(buf, dtype, count, start + entry["offset"]).reshape(shape)
+    return RoadNetwork(*(arrays[name] for name in ARRAYS))
@@ -0,0 +1,244 @@
+import io
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from map_art_app.layers import LAYERS, layer_fingerprint
+from map_art_app.render import EdgeGeometry, add_legend, draw_layers, plot_graph, restyle_graph
+from map_art_app.render_cache import RenderCache, network_fingerprint
+from map_art_app.vector import simplified_polylines
+
+
+class StageCache:
+    """In-process memo for one pipeline stage, keyed only on that stage's real inputs, with hit/miss counters"""
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """Return the cached value for key, or compute it; None results are not cached
+
+        Concurrent callers asking for a key that is already being computed wait for that result instead of
+        computing it again.
+        """
+        while True:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return self._entries[key]
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._pending[key] = threading.Event()
+                    break
+            pending.wait()
+        try:
+            value = compute()
+            if value is not None:
+                with self._lock:
+                    self._entries[key] = value
+                    if len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+        return value
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+PREVIEW_DPI = 200
+# The quick first render: screen resolution, from a network decimated to match
+QUICK_DPI = 72
+# Decimated coordinates are snapped to a tenth of a quick-preview pixel
+SUBPIXEL = 10
+
+# Shared by every session in the process: all of these are read-only once built. Networks are compact RoadNetworks
+# (usually memory-mapped from the graph store), never the networkx graphs they were built from
+NETWORKS = StageCache("network", maxsize=8)
+DECIMATED = StageCache("decimated", maxsize=8)
+FINGERPRINTS = StageCache("fingerprint", maxsize=8)
+
+
+def _no_progress(stage):
+    pass
+
+
+def prepare_network(source, fetch_network, on_stage=_no_progress):
+    """(network, road classes) for a source such as ("bbox", bbox), or None if it has no roads
+
+    fetch_network(source) returns a RoadNetwork, or None for an area without roads (see GraphStore.network).
+    """
+    on_stage("fetching")
+    network = NETWORKS.get(source, lambda: fetch_network(source))
+    if network is None or not len(network):
+        return None
+    return network, network.classes
+
+
+def prepare_layers(bounds, layer_style, fetch_layers, on_stage=_no_progress):
+    """(name, PolygonLayer, color) in drawing order for the (name, color) pairs of layer_style
+
+    fetch_layers(bounds, names) returns {name: PolygonLayer} (see LayerCache.layers).
+    """
+    if not layer_style:
+        return ()
+    on_stage("layers")
+    layer_style = sorted(layer_style, key=lambda item: list(LAYERS).index(item[0]))
+    data = fetch_layers(bounds, [name for name, _ in layer_style])
+    return tuple((name, data[name], color) for name, color in layer_style)
+
+
+def decimate_network(geometry, classes, pixel):
+    """(geometry, classes) for drawing at a pixel size of `pixel` degrees of longitude: lines simplified to half a
+    pixel, one copy of each two-way street, and no edges spanning less than a pixel"""
+    left, bottom, right, top = geometry.bounds
+    # Same local Mercator stretch as the preview overlay, so a pixel is a pixel in both directions
+    stretch = 1 / math.cos(math.radians((bottom + top) / 2))
+    unit = pixel / SUBPIXEL
+    points = (geometry.vertices - (left, bottom)) / unit
+    points[:, 1] *= stretch
+    points, offsets, edges = simplified_polylines(points, geometry.offsets, classes, SUBPIXEL / 2)
+
+    extent = (np.maximum.reduceat(points, offsets[:-1]) - np.minimum.reduceat(points, offsets[:-1])).max(axis=1)
+    edges = edges[extent[edges] >= SUBPIXEL]
+    counts = offsets[edges + 1] - offsets[edges]
+    kept = np.zeros(len(edges) + 1, dtype=np.int64)
+    np.cumsum(counts, out=kept[1:])
+    vertices = points[np.repeat(offsets[edges] - kept[:-1], counts) + np.arange(kept[-1])] * unit
+    vertices[:, 1] /= stretch
+    return EdgeGeometry(vertices + (left, bottom), kept), classes[edges]
+
+
+def quick_preview(source, geometry, classes, style, layers=(), dpi=QUICK_DPI, figsize=(8, 8)):
+    """Screen-resolution PNG drawn from a network decimated to that resolution, framed like the full render"""
+    left, bottom, right, top = geometry.bounds
+    # Data width of one output pixel, generously assuming the map fills the whole figure
+    pixel = max(right - left, (top - bottom) / math.cos(math.radians((bottom + top) / 2))) / (figsize[0] * dpi)
+    small, small_classes = DECIMATED.get((source, dpi), lambda: decimate_network(geometry, classes, pixel))
+    colors, widths, background_color, show_legend = style
+    fig, ax = plot_graph(small, small_classes, dict(colors), dict(widths), background_color, figsize,
+                         bounds=geometry.bounds)
+    draw_layers(ax, layers)
+    if show_legend:
+        add_legend(ax, dict(colors))
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight", dpi=dpi)
+    return buf.getvalue()
+
+
+def freeze_style(custom_colors, custom_widths, background_color, show_legend):
+    """Hashable form of every input that affects only how the network is styled"""
+    return (tuple(sorted(custom_colors.items())), tuple(sorted(custom_widths.items())), background_color, show_legend)
+
+
+class MapRenderer:
+    """Per-session render stages: the network is drawn once per source, style-only changes restyle that figure"""
+
+    def __init__(self):
+        # Figures are mutable and not thread-safe, so unlike the stages above they are never shared between sessions
+        self.figures = StageCache("draw", maxsize=1)
+        self.styled = StageCache("style", maxsize=1)
+        # Held while a background job draws or encodes this session's figure
+        self.lock = threading.Lock()
+
+    def render(self, source, geometry, classes, style, layers=()):
+        colors, widths, background_color, show_legend = style
+        custom_colors, custom_widths = dict(colors), dict(widths)
+        fig, ax = self.figures.get(
+            source, lambda: plot_graph(geometry, classes, custom_colors, custom_widths, background_color)
+        )
+        fig = self.styled.get(
+            (source, style), lambda: _apply_style(fig, ax, custom_colors, custom_widths, background_color, show_legend)
+        )
+        # Layers go onto the same figure: toggling one only adds or removes its own collection
+        draw_layers(ax, layers)
+        return fig
+
+
+def _apply_style(fig, ax, custom_colors, custom_widths, background_color, show_legend):
+    restyle_graph(fig, ax, custom_colors, custom_widths, background_color)
+    legend = ax.get_legend()
+    if legend is not None:
+        legend.remove()
+    if show_legend:
+        add_legend(ax, custom_colors)
+    return fig
+
+
+def render_preview(source, style, renderer, fetch_network, on_stage=_no_progress, on_preview=None, render_cache=None,
+                   layer_style=(), fetch_layers=None):
+    """Everything behind "Generate Map": (display PNG bytes, export args), or None if the area has no roads
+
+    Export args are (geometry, classes, style, fingerprint, layers), the fingerprint covering the network and any
+    layers. With on_preview, a quick screen-resolution render (see quick_preview) is handed to it before the full
+    one starts; with a RenderCache, a map rendered before (by any session) is served from it without drawing
+    anything. layer_style is (name, color) pairs of area layers to draw under the roads, fetched with fetch_layers.
+    """
+    network = prepare_network(source, fetch_network, on_stage)
+    if network is None:
+        return None
+    geometry, classes = network
+    layers = prepare_layers(geometry.bounds, layer_style, fetch_layers, on_stage)
+    fingerprint = FINGERPRINTS.get(source, lambda: network_fingerprint(geometry, classes))
+    fingerprint = layer_fingerprint(fingerprint, layers)
+    export_args = (geometry, classes, style, fingerprint, layers)
+    key = RenderCache.key(fingerprint, style, "preview", dpi=PREVIEW_DPI)
+    if render_cache is not None:
+        png = render_cache.get(key)
+        if png is not None:
+            return png, export_args
+
+    if on_preview is not None:
+        on_stage("previewing")
+        on_preview(quick_preview(source, geometry, classes, style, layers))
+    on_stage("drawing")
+    with renderer.lock:
+        fig = renderer.render(source, geometry, classes, style, layers)
+        on_stage("encoding")
+        buf = io.BytesIO()
+        # Same output as st.pyplot, but encoded once here instead of on every rerun
+        fig.savefig(buf, format="png", bbox_inches="tight", dpi=PREVIEW_DPI)
+    png = buf.getvalue()
+    if render_cache is not None:
+        render_cache.put(key, png)
+    return png, export_args
+
+
+def warm_up(store, places=()):
+    """Boot-time hook: import the render path's heavy dependencies and map the stored networks of popular places
+
+    Every place found in the graph store lands in NETWORKS under the same ("place", name) source the app renders, so
+    a first Generate for it skips fetching entirely. Nothing is downloaded; places not in the store are skipped.
+    Returns the places warmed.
+    """
+    import matplotlib.backends.backend_agg  # noqa: F401
+    import osmnx  # noqa: F401
+
+    warmed = []
+    for place in places:
+        source = ("place", place)
+        network = NETWORKS.get(source, lambda: store.network(store.source_key(source),
+                                                              lambda: store.load(store.place_key(place))))
+        if network is not None:
+            warmed.append(place)
+    return warmed
+
+
+def stage_stats(renderer=None):
+    """Hit/miss counters for every stage, including a session's render stages when given"""
+    stages = [NETWORKS, DECIMATED, FINGERPRINTS]
+    if renderer is not None:
+        stages += [renderer.figures, renderer.styled]
+    return {stage.name: stage.stats() for stage in stages}
@@ -0,0 +1,47 @@
+DEFAULT_COLORS = {
+    "<100": "#d40a47", "100-200": "#e78119", "200-400": "#30bab0",
+    "400-800": "#bbbbbb", ">800": "#ffffff", "primary": "#ffffff"
+}
+DEFAULT_WIDTHS = {
+    "<100": 0.3, "100-200": 0.45, "200-400": 0.6,
+    "400-800": 0.75, ">800": 0.5, "primary": 0.8
+}
+DEFAULT_BACKGROUND = "#31bab0"
+
+STYLE_PRESETS = {
+    "Minimal": {
+        "colors": {"<100": "#cccccc", "100-200": "#bbbbbb", "200-400": "#999999",
+                   "400-800": "#777777", ">800": "#555555", "primary": "#000000"},
+        "background": "#ffffff"
+    },
+    "Bold": {
+        "colors": {"<100": "#d40a47", "100-200": "#e78119", "200-400": "#30bab0",
+                   "400-800": "#bbbbbb", ">800": "#ffffff", "primary": "#ffffff"},
+        "background": "#31bab0"
+    },
+    "Midnight": {
+        "colors": {"<100": "#5dd39e", "100-200": "#348aa7", "200-400": "#525174",
+                   "400-800": "#513b56", ">800": "#6c8ead", "primary": "#ffffff"},
+        "background": "#061529"
+    }
+}
+# Colors and widths of every preset, already in pipeline.freeze_style's sorted form
+FROZEN_PRESETS = {
+    name: (tuple(sorted(preset["colors"].items())), preset["background"])
+    for name, preset in {"None": {"colors": DEFAULT_COLORS, "background": DEFAULT_BACKGROUND},
+                         **STYLE_PRESETS}.items()
+}
+FROZEN_WIDTHS = tuple(sorted(DEFAULT_WIDTHS.items()))
+
+
+def apply_style_preset(preset):
+    return STYLE_PRESETS.get(preset)
+
+
+def preset_style(preset, show_legend=True, transparent=False):
+    """Frozen style for a preset name ("None" gives the app's defaults), as used by headless renders"""
+    frozen = FROZEN_PRESETS.get(preset)
+    if frozen is None:
+        raise KeyError(f"Unknown style preset '{preset}'; choose from {', '.join(FROZEN_PRESETS)}")
+    colors, background_color = frozen
+    return colors, FROZEN_WIDTHS, "none" if transparent else background_color, show_legend
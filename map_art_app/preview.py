@@ -0,0 +1,134 @@
+import json
+import math
+
+import folium
+import folium.plugins
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+
+from map_art_app.export import PRINT_SIZES, poster_window
+from map_art_app.roads import ROAD_CLASSES
+from map_art_app.vector import chain_edges, simplified_polylines
+
+# Web Mercator tiles are 256 px wide; at zoom z one screen pixel spans 360 / (256 * 2**z) degrees of longitude
+TILE_PX = 256
+# Overlay coordinates are snapped to a tenth of a screen pixel, simplification removes what is under half a pixel
+SUBPIXEL = 10
+
+
+def base_map(center, zoom):
+    """The interactive map without anything that changes between reruns; built once per session
+
+    The marker and the road overlay are passed to st_folium as feature groups instead, and the view through its
+    center/zoom arguments, so this map (and the payload st_folium sends for it) stays byte-identical.
+    """
+    m = folium.Map(location=center, zoom_start=zoom, tiles=None)
+    folium.TileLayer('CartoDB positron').add_to(m)
+    folium.TileLayer('CartoDB dark_matter').add_to(m)
+    folium.TileLayer(
+        tiles='https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png',
+        attr='OpenTopoMap',
+        name='OpenTopoMap',
+        overlay=False,
+        control=True
+    ).add_to(m)
+    folium.TileLayer(
+        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+        attr='Esri',
+        name='Esri World Imagery',
+        overlay=False,
+        control=True
+    ).add_to(m)
+    folium.plugins.Fullscreen(
+        position="topright",
+        title="Expand me",
+        title_cancel="Exit me",
+        force_separate_button=True,
+    ).add_to(m)
+    folium.TileLayer('OpenStreetMap').add_to(m)
+    folium.LayerControl().add_to(m)
+    # If you want get the user device position after load the map, set auto_start=True
+    folium.plugins.LocateControl(auto_start=False).add_to(m)
+    return m
+
+
+def marker_layer(lat, lng):
+    layer = folium.FeatureGroup(name="Marker", control=False)
+    folium.Marker(location=[lat, lng], draggable=False, tooltip="Click the map to move me").add_to(layer)
+    return layer
+
+
+def detach_layers(m, layers):
+    """st_folium adds the feature groups it is given to the map itself; take them off again so they do not leak
+    into the base map's script on the next rerun"""
+    for layer in layers:
+        m._children.pop(layer.get_name(), None)
+
+
+def overlay_geojson(geometry, classes, style, zoom):
+    """The road network as GeoJSON decimated for display at zoom: one MultiLineString per road class, with its
+    Leaflet path options as the "style" property
+
+    Lines are simplified to half a screen pixel, two-way duplicates and runs shorter than a pixel are dropped and
+    coordinates are rounded to a tenth of a pixel, which is all Leaflet can show at that zoom.
+    """
+    colors, widths = dict(style[0]), dict(style[1])
+    left, bottom, right, top = geometry.bounds
+    # Mercator is locally isotropic: a degree of latitude is 1 / cos(lat) times a degree of longitude on screen
+    stretch = 1 / math.cos(math.radians((bottom + top) / 2))
+    unit = 360 / (TILE_PX * 2 ** zoom) / SUBPIXEL
+    decimals = max(0, math.ceil(-math.log10(unit)))
+
+    points = (geometry.vertices - (left, bottom)) / unit
+    points[:, 1] *= stretch
+    points, offsets, edges = simplified_polylines(points, geometry.offsets, classes, SUBPIXEL / 2)
+
+    features = []
+    for code, name in enumerate(ROAD_CLASSES):
+        lines = []
+        for run in chain_edges(points, offsets, edges[classes[edges] == code]):
+            if np.ptp(run, axis=0).max() < SUBPIXEL:
+                continue
+            lon = run[:, 0] * unit + left
+            lat = run[:, 1] * unit / stretch + bottom
+            lines.append(np.column_stack([lon, lat]).round(decimals).tolist())
+        if lines:
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "MultiLineString", "coordinates": lines},
+                "properties": {"road_class": name, "style": {"color": colors[name], "opacity": 0.9,
+                                                             "weight": round(1 + 2 * widths[name], 1)}},
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+class StaticGeoJson(MacroElement):
+    """GeoJSON layer serialized once when built; folium.GeoJson re-encodes its data every time st_folium renders it
+
+    Each feature is drawn with the Leaflet path options in its "style" property.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.geoJson({{ this.data }}, {
+            style: function(feature) { return feature.properties.style; }
+        }).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, data):
+        super().__init__()
+        self._name = "StaticGeoJson"
+        self.data = json.dumps(data, separators=(",", ":"))
+
+
+def overlay_layer(geometry, classes, style, zoom, size_name=None):
+    """Feature group with the decimated network and, for a print size, the frame the poster export will cover"""
+    layer = folium.FeatureGroup(name="Road preview", control=False)
+    StaticGeoJson(overlay_geojson(geometry, classes, style, zoom)).add_to(layer)
+    if size_name is not None:
+        width_cm, height_cm = PRINT_SIZES[size_name]
+        left, bottom, right, top = poster_window(geometry.bounds, width_cm, height_cm)
+        folium.Rectangle([[bottom, left], [top, right]], color="#061529", weight=2, dash_array="6 4",
+                         fill=False, tooltip=f"{size_name} print").add_to(layer)
+    return layer
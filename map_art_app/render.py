@@ -0,0 +1,167 @@
+import threading
+
+import numpy as np
+import shapely
+
+from map_art_app.roads import ROAD_CLASSES
+
+# Legend rows, top to bottom: (road class, label)
+LEGEND_ROWS = [("<100", "Length < 100 m"), ("100-200", "100-200 m"), ("200-400", "200-400 m"),
+               ("400-800", "400-800 m"), (">800", "> 800 m"), ("primary", "Primary")]
+# Legend handles per (colors, marker size); ax.legend copies them, so one set serves every figure
+LEGEND_HANDLE_SETS = 64
+_legend_handles = {}
+_legend_lock = threading.Lock()
+
+
+class EdgeGeometry:
+    """Edge polylines as one flat (N, 2) vertex buffer plus offsets; edge i is vertices[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, vertices, offsets):
+        self.vertices = vertices
+        self.offsets = offsets
+        self._segments = None
+
+    @classmethod
+    def from_graph(cls, G):
+        """Build the buffers once per graph, in G.edges order, straight lines where an edge has no geometry"""
+        node_index = {n: i for i, n in enumerate(G.nodes)}
+        node_xy = np.array([(d["x"], d["y"]) for _, d in G.nodes(data=True)], dtype=np.float64).reshape(-1, 2)
+        edges = list(G.edges(data="geometry"))
+        u = np.fromiter((node_index[e[0]] for e in edges), dtype=np.int64, count=len(edges))
+        v = np.fromiter((node_index[e[1]] for e in edges), dtype=np.int64, count=len(edges))
+        geoms = np.array([e[2] for e in edges], dtype=object)
+
+        has_geom = shapely.is_geometry(geoms)
+        counts = np.full(len(edges), 2, dtype=np.int64)
+        counts[has_geom] = shapely.get_num_coordinates(geoms[has_geom])
+        offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        vertices = np.empty((offsets[-1], 2), dtype=np.float64)
+        straight = np.flatnonzero(~has_geom)
+        vertices[offsets[straight]] = node_xy[u[straight]]
+        vertices[offsets[straight] + 1] = node_xy[v[straight]]
+        if has_geom.any():
+            coords, owner = shapely.get_coordinates(geoms[has_geom], return_index=True)
+            # Position of each coordinate inside its own polyline, then shifted to that edge's offset
+            starts = np.zeros(has_geom.sum(), dtype=np.int64)
+            np.cumsum(counts[has_geom][:-1], out=starts[1:])
+            vertices[offsets[np.flatnonzero(has_geom)][owner] + np.arange(len(coords)) - starts[owner]] = coords
+        return cls(vertices, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def bounds(self):
+        """(left, bottom, right, top) of all vertices"""
+        (left, bottom), (right, top) = self.vertices.min(axis=0), self.vertices.max(axis=0)
+        return left, bottom, right, top
+
+    def segments(self):
+        """Per-edge views into the vertex buffer, built once and shared by every render"""
+        if self._segments is None:
+            self._segments = np.split(self.vertices, self.offsets[1:-1])
+        return self._segments
+
+
+def _config_ax(ax, bounds, padding=0.02):
+    """Same framing as ox.plot_graph: 2% padding, no axes decoration, aspect corrected for latitude"""
+    left, bottom, right, top = bounds
+    pad_x, pad_y = (right - left) * padding, (top - bottom) * padding
+    ax.set_xlim(left - pad_x, right + pad_x)
+    ax.set_ylim(bottom - pad_y, top + pad_y)
+    ax.margins(0)
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    ax.get_xaxis().set_visible(False)
+    ax.get_yaxis().set_visible(False)
+    ax.set_aspect(1 / np.cos(np.deg2rad((bottom + top) / 2)))
+
+
+def plot_graph(geometry, classes, custom_colors, custom_widths, background_color, figsize=(8, 8), bounds=None):
+    """Draw the street network with one LineCollection per road class, framed on bounds (default: its own)"""
+    # matplotlib is imported on the first draw rather than when the app starts
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize, facecolor=background_color, frameon=False)
+    ax = fig.add_subplot()
+    ax.set_facecolor(background_color)
+
+    segments = geometry.segments()
+    for code, name in enumerate(ROAD_CLASSES):
+        members = np.flatnonzero(classes == code)
+        if not len(members):
+            continue
+        collection = LineCollection([segments[i] for i in members], colors=custom_colors[name],
+                                    linewidths=custom_widths[name], label=f"_road {name}", zorder=1)
+        ax.add_collection(collection, autolim=False)
+
+    _config_ax(ax, bounds or geometry.bounds)
+    return fig, ax
+
+
+def draw_layers(ax, layers):
+    """Make ax show exactly these (name, PolygonLayer, color) area layers under the roads, in the given order
+
+    Layers already on ax are only recolored, so adding one costs just that layer's collection.
+    """
+    from matplotlib.collections import PathCollection
+
+    drawn = {c.get_label()[len("_layer "):]: c for c in ax.collections if c.get_label().startswith("_layer ")}
+    wanted = {name for name, _, _ in layers}
+    for name, collection in drawn.items():
+        if name not in wanted:
+            collection.remove()
+    for i, (name, layer, color) in enumerate(layers):
+        collection = drawn.get(name)
+        if collection is None:
+            collection = PathCollection([layer.path()], facecolors=color, edgecolors="none", linewidths=0,
+                                        label=f"_layer {name}")
+            ax.add_collection(collection, autolim=False)
+        collection.set_facecolor(color)
+        # Below the roads (zorder 1), stacked in layer order
+        collection.set_zorder(0.5 + i / (2 * len(layers)))
+
+
+def restyle_graph(fig, ax, custom_colors, custom_widths, background_color):
+    """Swap colors/widths on an already drawn network without touching its geometry"""
+    fig.set_facecolor(background_color)
+    ax.set_facecolor(background_color)
+    for collection in ax.collections:
+        label = collection.get_label()
+        if label.startswith("_road "):
+            name = label[len("_road "):]
+            collection.set_color(custom_colors[name])
+            collection.set_linewidth(custom_widths[name])
+
+
+def legend_handles(custom_colors, markersize=16):
+    """The legend's square markers for these colors, built once per distinct (colors, size)"""
+    key = (tuple(custom_colors[name] for name, _ in LEGEND_ROWS), markersize)
+    with _legend_lock:
+        handles = _legend_handles.get(key)
+        if handles is None:
+            from matplotlib.lines import Line2D
+
+            if len(_legend_handles) >= LEGEND_HANDLE_SETS:
+                _legend_handles.clear()
+            handles = _legend_handles[key] = [
+                Line2D([0], [0], marker='s', color="#061529", label=label, markerfacecolor=color, markersize=markersize)
+                for (_, label), color in zip(LEGEND_ROWS, key[0])
+            ]
+        return handles
+
+
+def add_legend(ax, custom_colors, markersize=16, fontsize=16, bbox_to_anchor=(0.0, 0.0), bbox_transform=None):
+    legend_elements = legend_handles(custom_colors, markersize)
+
+    legend = ax.legend(handles=legend_elements, bbox_to_anchor=bbox_to_anchor, bbox_transform=bbox_transform,
+                       frameon=True, ncol=1,
+                       facecolor='#061529', framealpha=0.9, loc='lower left', fontsize=fontsize,
+                       prop={'family': "Georgia", 'size': fontsize})
+
+    for text in legend.get_texts():
+        text.set_color("w")
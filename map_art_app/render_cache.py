@@ -0,0 +1,89 @@
+import hashlib
+import io
+import json
+import os
+import threading
+
+from map_art_app.diskcache import DiskLRU
+
+DEFAULT_ROOT = os.path.join("~", ".cache", "map_art_app", "renders")
+DEFAULT_MAX_MB = 1024
+# Bump when a renderer change alters output for the same inputs, so stale entries are never served
+RENDER_VERSION = 1
+
+
+def network_fingerprint(geometry, classes):
+    """Content hash of exactly what gets drawn: every edge polyline and its road class"""
+    digest = hashlib.sha1()
+    for array in (geometry.offsets, geometry.vertices, classes):
+        digest.update(str(array.dtype).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Encoded map outputs on disk, keyed by network fingerprint + resolved style + output parameters
+
+    Shared by every session and Streamlit worker using the same directory; a hit is served without touching
+    matplotlib.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        root = root or os.environ.get("MAP_ART_RENDER_CACHE", DEFAULT_ROOT)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("MAP_ART_RENDER_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 ** 2)
+        self.cache = DiskLRU(root, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(fingerprint, style, kind, **params):
+        """Cache key for one output: kind is e.g. "preview" or "pdf", params its size, dpi and the like"""
+        spec = json.dumps([RENDER_VERSION, fingerprint, style, kind, params], sort_keys=True)
+        return f"{kind}_{hashlib.sha1(spec.encode()).hexdigest()}"
+
+    def get(self, key):
+        """Cached bytes for key, or None on a miss"""
+        path = self.cache.get(key)
+        data = None
+        if path is not None:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # Evicted by another worker between the lookup and the read
+                pass
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def put(self, key, data):
+        self.cache.put(key, lambda f: f.write(data))
+
+    def get_or_render(self, key, render):
+        """Cached bytes for key, or render() (bytes) stored and returned"""
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def download(self, key, render):
+        """data for st.download_button: a callable that, on click only, serves the cached bytes or renders and caches
+
+        render is a zero-argument download callable returning a file object or a string. Nothing is read, and no hit
+        or miss counted, on the reruns in between.
+        """
+        def cached_or_render():
+            def render_bytes():
+                out = render()
+                return out.encode() if isinstance(out, str) else out.read()
+            return io.BytesIO(self.get_or_render(key, render_bytes))
+        return cached_or_render
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self.cache.total_bytes()}
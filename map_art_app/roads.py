@@ -0,0 +1,52 @@
+import numpy as np
+
+# Style classes in legend order; the index of a class is its code in the class arrays
+ROAD_CLASSES = ["<100", "100-200", "200-400", "400-800", ">800", "primary"]
+PRIMARY_CLASS = ROAD_CLASSES.index("primary")
+# Upper edges (m, inclusive) of the length classes; np.digitize sends longer and missing lengths to ">800"
+LENGTH_BINS = np.array([100, 200, 400, 800], dtype=np.float64)
+
+
+def _is_primary(highway):
+    # Substring test for tags like "primary_link"; membership test when simplification merged several tags
+    if isinstance(highway, str):
+        return "primary" in highway
+    return "primary" in (highway or ())
+
+
+def extract_graph_edges(G):
+    """Columnar edge attributes in G.edges order: lengths (NaN if missing), highway codes + vocabulary, primary mask"""
+    data = [d for _, _, d in G.edges(data=True)]
+    lengths = np.fromiter((d.get("length", np.nan) for d in data), dtype=np.float64, count=len(data))
+
+    vocab = {}
+    tokens = (d.get("highway", "") for d in data)
+    highway_codes = np.fromiter(
+        (vocab.setdefault(tuple(h) if isinstance(h, list) else h, len(vocab)) for h in tokens),
+        dtype=np.int32, count=len(data),
+    )
+    highways = [list(h) if isinstance(h, tuple) else h for h in vocab]
+    primary = np.array([_is_primary(h) for h in highways], dtype=bool)[highway_codes]
+    return lengths, highway_codes, highways, primary
+
+
+def road_classes(lengths, primary):
+    """Class code per edge: length bucket, overridden by "primary" wherever a length is known"""
+    classes = np.digitize(lengths, LENGTH_BINS, right=True).astype(np.uint8)
+    classes[primary & ~np.isnan(lengths)] = PRIMARY_CLASS
+    return classes
+
+
+def style_lookup(custom_colors, custom_widths):
+    """Per-class color and width lookup tables, indexed by class code"""
+    colors = np.array([custom_colors[c] for c in ROAD_CLASSES])
+    widths = np.array([custom_widths[c] for c in ROAD_CLASSES], dtype=np.float64)
+    return colors, widths
+
+
+def classify_road_segments(edges, custom_colors, custom_widths):
+    """Color and width arrays for the columnar edges returned by extract_graph_edges"""
+    lengths, _, _, primary = edges
+    classes = road_classes(lengths, primary)
+    colors, widths = style_lookup(custom_colors, custom_widths)
+    return colors[classes], widths[classes]
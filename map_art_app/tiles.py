@@ -0,0 +1,128 @@
+import math
+from collections import OrderedDict
+
+import networkx as nx
+import osmnx as ox
+
+from map_art_app.graph_store import GraphNotCached, GraphStore
+
+# Tile edge in degrees (~2 km); the largest "Bounding Box Size" in the app spans 5x5 tiles
+TILE_SIZE = 0.02
+# Tiles kept decoded in memory per process on top of the on-disk store
+MEMORY_TILES = 64
+# Margin osmnx downloads around a query polygon so streets at its border are simplified like the rest
+BUFFER_METERS = 500
+
+
+def fetch_raw_bbox(bbox, network_type="all"):
+    """Raw (unsimplified) network for a bbox; edges crossing the border are kept so neighbours stitch together"""
+    try:
+        return ox.graph.graph_from_bbox(bbox, network_type=network_type, simplify=False,
+                                        retain_all=True, truncate_by_edge=True)
+    except ox._errors.InsufficientResponseError:
+        # Water, parks, etc: cache the empty tiles so they are not requested again
+        return nx.MultiDiGraph(crs=ox.settings.default_crs)
+
+
+def buffer_polygon(polygon, meters=BUFFER_METERS):
+    """Lat/lon polygon grown by meters, buffered in its UTM projection as ox.graph.graph_from_polygon does"""
+    projected, crs = ox.projection.project_geometry(polygon)
+    buffered, _ = ox.projection.project_geometry(projected.buffer(meters), crs=crs, to_latlong=True)
+    return buffered
+
+
+class TiledGraphCache:
+    """Assemble bbox graphs from fixed lat/lon tiles, each fetched once and kept in the graph store"""
+
+    def __init__(self, store=None, tile_size=TILE_SIZE, fetch=fetch_raw_bbox):
+        self.store = store or GraphStore()
+        self.tile_size = tile_size
+        self.fetch = fetch
+        self.fetches = 0
+        self._memory = OrderedDict()
+
+    def tiles_for_bbox(self, bbox):
+        """Integer (column, row) indices of every tile touched by a (left, bottom, right, top) bbox"""
+        left, bottom, right, top = bbox
+        cols = range(math.floor(left / self.tile_size), math.ceil(right / self.tile_size))
+        rows = range(math.floor(bottom / self.tile_size), math.ceil(top / self.tile_size))
+        return [(col, row) for col in cols for row in rows]
+
+    def tile_bbox(self, tile):
+        col, row = tile
+        return (col * self.tile_size, row * self.tile_size, (col + 1) * self.tile_size, (row + 1) * self.tile_size)
+
+    def tile_key(self, tile):
+        return f"tile_{self.store.network_type}_{self.tile_size:g}_{tile[0]}_{tile[1]}"
+
+    def _remember(self, tile, G):
+        self._memory[tile] = G
+        self._memory.move_to_end(tile)
+        if len(self._memory) > MEMORY_TILES:
+            self._memory.popitem(last=False)
+
+    def _cached_tile(self, tile):
+        if tile in self._memory:
+            self._memory.move_to_end(tile)
+            return self._memory[tile]
+        G = self.store.load(self.tile_key(tile))
+        if G is not None:
+            self._remember(tile, G)
+        return G
+
+    def _fetch_tiles(self, tiles):
+        """Download the rectangle spanning the missing tiles in one request and split it into tiles"""
+        if self.store.offline:
+            raise GraphNotCached(f"Tiles {tiles} are not in the offline store at {self.store.cache.root}")
+        boxes = [self.tile_bbox(tile) for tile in tiles]
+        span = (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+        self.fetches += 1
+        G = self.fetch(span, self.store.network_type)
+
+        fetched = {}
+        for tile, box in zip(tiles, boxes):
+            try:
+                part = ox.truncate.truncate_graph_bbox(G, box, truncate_by_edge=True)
+            except ValueError:
+                part = nx.MultiDiGraph(**G.graph)
+            self.store.save(self.tile_key(tile), part)
+            self._remember(tile, part)
+            fetched[tile] = part
+        return fetched
+
+    def covering_tiles(self, bbox):
+        """Tiles graph_from_bbox needs for bbox: those under its buffered polygon"""
+        return self.tiles_for_bbox(buffer_polygon(ox.utils_geo.bbox_to_poly(bbox)).bounds)
+
+    def prefetch(self, bbox):
+        """Download any tiles of bbox not yet on disk without assembling the graph; returns how many were missing"""
+        missing = [tile for tile in self.covering_tiles(bbox)
+                   if tile not in self._memory and self.store.cache.get(self.tile_key(tile)) is None]
+        if missing:
+            self._fetch_tiles(missing)
+        return len(missing)
+
+    def graph_from_bbox(self, bbox):
+        """Merge the covering tiles, simplify and clip to bbox, matching ox.graph.graph_from_bbox output
+
+        Same order as osmnx: the graph is simplified and its street counts taken over the bbox buffered by
+        BUFFER_METERS, and only then truncated to the bbox, so nodes by the border keep their outside neighbours.
+        """
+        polygon = ox.utils_geo.bbox_to_poly(bbox)
+        buffered = buffer_polygon(polygon)
+        graphs = {tile: self._cached_tile(tile) for tile in self.tiles_for_bbox(buffered.bounds)}
+        missing = [tile for tile, G in graphs.items() if G is None]
+        if missing:
+            graphs.update(self._fetch_tiles(missing))
+
+        G_buff = nx.compose_all(graphs.values())
+        # compose_all copies graph attributes from the tiles, including their unsimplified flag
+        G_buff.graph["simplified"] = False
+        G_buff = ox.truncate.truncate_graph_polygon(G_buff, buffered)
+        G_buff = ox.truncate.largest_component(G_buff)
+        G_buff = ox.simplify_graph(G_buff)
+        G = ox.truncate.truncate_graph_polygon(G_buff, polygon)
+        G = ox.truncate.largest_component(G)
+        # Counted on the buffered graph: street counts stored with each tile are cut off at its border
+        nx.set_node_attributes(G, ox.stats.count_streets_per_node(G_buff, nodes=G.nodes), name="street_count")
+        return G
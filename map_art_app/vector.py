@@ -0,0 +1,297 @@
+import io
+import zlib
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from map_art_app.export import CM_PER_INCH, PRINT_SIZES, REFERENCE_INCHES, poster_window
+from map_art_app.render import LEGEND_ROWS
+from map_art_app.roads import ROAD_CLASSES
+
+PT_PER_INCH = 72
+# Vector coordinates are written as integers in 1/100 pt
+UNITS_PER_PT = 100
+
+
+def simplify_polylines(points, offsets, tolerance):
+    """Douglas-Peucker over every polyline at once; returns a keep mask for points
+
+    Each pass handles the open (start, end) ranges of all polylines together, so the Python loop runs once per
+    recursion level rather than once per edge.
+    """
+    keep = np.zeros(len(points), dtype=bool)
+    keep[offsets[:-1]] = True
+    keep[offsets[1:] - 1] = True
+    starts, ends = offsets[:-1], offsets[1:] - 1
+    open_ranges = ends - starts > 1
+    starts, ends = starts[open_ranges], ends[open_ranges]
+
+    while len(starts):
+        interior = ends - starts - 1
+        owner = np.repeat(np.arange(len(starts)), interior)
+        first = np.zeros(len(starts), dtype=np.int64)
+        np.cumsum(interior[:-1], out=first[1:])
+        idx = np.arange(interior.sum()) - first[owner] + starts[owner] + 1
+
+        # Distance from each interior point to its range's chord (as a segment, so closed loops still work)
+        a, b, p = points[starts[owner]], points[ends[owner]], points[idx]
+        ab = b - a
+        denom = np.einsum("ij,ij->i", ab, ab)
+        t = np.clip(np.einsum("ij,ij->i", p - a, ab) / np.where(denom > 0, denom, 1), 0, 1)
+        dist = np.hypot(*(p - a - t[:, None] * ab).T)
+
+        dmax = np.maximum.reduceat(dist, first)
+        split = dmax > tolerance
+        # First interior point reaching its range's maximum
+        hits = np.flatnonzero((dist == dmax[owner]) & split[owner])
+        hit_owner, first_hit = np.unique(owner[hits], return_index=True)
+        mid = idx[hits[first_hit]]
+        keep[mid] = True
+
+        starts = np.concatenate([starts[hit_owner], mid])
+        ends = np.concatenate([mid, ends[hit_owner]])
+        open_ranges = ends - starts > 1
+        starts, ends = starts[open_ranges], ends[open_ranges]
+    return keep
+
+
+def simplified_polylines(points, offsets, classes, tolerance):
+    """Simplify polylines to tolerance, round them to integer units and drop reverse duplicates
+
+    Returns (integer points, offsets, indices of the edges to draw).
+    """
+    keep = simplify_polylines(points, offsets, tolerance)
+    counts = np.add.reduceat(keep.astype(np.int64), offsets[:-1])
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    points = np.rint(points[keep]).astype(np.int64)
+
+    # Two-way streets are stored once per direction; keep one copy of each (class, endpoints, shape) polyline
+    first, last = points[offsets[:-1]], points[offsets[1:] - 1]
+    swap = (first[:, 0] > last[:, 0]) | ((first[:, 0] == last[:, 0]) & (first[:, 1] > last[:, 1]))
+    lo, hi = np.where(swap[:, None], last, first), np.where(swap[:, None], first, last)
+    sums = np.add.reduceat(points, offsets[:-1])
+    key = np.column_stack([classes, lo, hi, counts, sums])
+    _, unique = np.unique(key, axis=0, return_index=True)
+    edges = np.sort(unique)
+    return points, offsets, edges
+
+
+def to_paper(vertices, bounds, width_pt, height_pt):
+    """Lon/lat vertices in (float) paper units, y down, for the poster window framing bounds"""
+    left, bottom, right, top = poster_window(bounds, width_pt, height_pt)
+    points = np.empty_like(vertices)
+    points[:, 0] = (vertices[:, 0] - left) * width_pt * UNITS_PER_PT / (right - left)
+    points[:, 1] = (top - vertices[:, 1]) * height_pt * UNITS_PER_PT / (top - bottom)
+    return points
+
+
+def paper_polylines(geometry, classes, width_pt, height_pt, dpi):
+    """Edges in integer paper units (y down), simplified to half an output pixel, with reverse duplicates dropped"""
+    points = to_paper(geometry.vertices, geometry.bounds, width_pt, height_pt)
+    return simplified_polylines(points, geometry.offsets, classes, 0.5 * PT_PER_INCH / dpi * UNITS_PER_PT)
+
+
+def paper_rings(layer, bounds, width_pt, height_pt, dpi):
+    """Yield a PolygonLayer's rings in integer paper units, simplified to half an output pixel, without the closing
+    point; rings that collapse to fewer than three points are dropped"""
+    points = to_paper(layer.vertices, bounds, width_pt, height_pt)
+    keep = simplify_polylines(points, layer.ring_offsets, 0.5 * PT_PER_INCH / dpi * UNITS_PER_PT)
+    counts = np.add.reduceat(keep.astype(np.int64), layer.ring_offsets[:-1])
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    points = np.rint(points[keep]).astype(np.int64)
+    for i in np.flatnonzero(counts >= 4):
+        yield points[offsets[i]:offsets[i + 1] - 1]
+
+
+def chain_edges(points, offsets, edges):
+    """Greedily join edges that meet end to start (reversing where needed) into longer point runs"""
+    ends = {}
+    for i in edges:
+        for end in (offsets[i], offsets[i + 1] - 1):
+            ends.setdefault(tuple(points[end]), []).append(i)
+
+    used = set()
+    for i in edges:
+        if i in used:
+            continue
+        used.add(i)
+        run = [points[offsets[i]:offsets[i + 1]]]
+        tip = tuple(run[-1][-1])
+        while True:
+            candidates = ends.get(tip, [])
+            while candidates and candidates[-1] in used:
+                candidates.pop()
+            if not candidates:
+                break
+            j = candidates.pop()
+            used.add(j)
+            part = points[offsets[j]:offsets[j + 1]]
+            part = part if tuple(part[0]) == tip else part[::-1]
+            run.append(part[1:])
+            tip = tuple(part[-1])
+        yield np.concatenate(run)
+
+
+def _styled_runs(geometry, classes, style, width_pt, height_pt, dpi):
+    colors, widths, background_color, show_legend = style
+    custom_colors, custom_widths = dict(colors), dict(widths)
+    scale = min(width_pt, height_pt) / PT_PER_INCH / REFERENCE_INCHES
+    points, offsets, edges = paper_polylines(geometry, classes, width_pt, height_pt, dpi)
+    for code, name in enumerate(ROAD_CLASSES):
+        members = edges[classes[edges] == code]
+        if len(members):
+            yield custom_colors[name], custom_widths[name] * scale, chain_edges(points, offsets, members)
+
+
+def _legend_rows(style, width_pt, height_pt):
+    """(swatch color, label, x, y baseline, font size) in pt, y measured from the top, matching add_legend's layout"""
+    colors = dict(style[0])
+    scale = min(width_pt, height_pt) / PT_PER_INCH / REFERENCE_INCHES
+    size = 16 * scale
+    row = size * 1.4
+    x, y0 = size * 0.8, height_pt - size * 0.8 - row * len(LEGEND_ROWS)
+    return [(colors[name], label, x, y0 + row * (i + 0.8), size)
+            for i, (name, label) in enumerate(LEGEND_ROWS)], (x, y0, size, row)
+
+
+def export_svg(f, geometry, classes, style, width_cm, height_cm, dpi=300, layers=()):
+    """Stream an SVG poster into a text file object: one filled <path> per area layer, then one <path> per style
+    class, runs written as they are chained"""
+    width_pt, height_pt = width_cm / CM_PER_INCH * PT_PER_INCH, height_cm / CM_PER_INCH * PT_PER_INCH
+    background_color, show_legend = style[2], style[3]
+    f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width_pt:.2f}pt" height="{height_pt:.2f}pt" '
+            f'viewBox="0 0 {round(width_pt * UNITS_PER_PT)} {round(height_pt * UNITS_PER_PT)}">\n')
+    if background_color != "none":
+        f.write(f'<rect width="100%" height="100%" fill="{background_color}"/>\n')
+    for _, layer, color in layers:
+        if len(layer):
+            f.write(f'<path fill="{color}" stroke="none" d="')
+            for ring in paper_rings(layer, geometry.bounds, width_pt, height_pt, dpi):
+                f.write("M" + " ".join(map(str, ring.ravel().tolist())) + "Z")
+            f.write('"/>\n')
+    for color, width, runs in _styled_runs(geometry, classes, style, width_pt, height_pt, dpi):
+        f.write(f'<path fill="none" stroke="{color}" stroke-width="{width * UNITS_PER_PT:.0f}" '
+                f'stroke-linecap="round" stroke-linejoin="round" d="')
+        for run in runs:
+            f.write("M" + " ".join(map(str, run.ravel().tolist())))
+        f.write('"/>\n')
+    if show_legend:
+        rows, (x, y0, size, row) = _legend_rows(style, width_pt, height_pt)
+        u = UNITS_PER_PT
+        f.write(f'<rect x="{(x - size * 0.4) * u:.0f}" y="{(y0 - size * 0.3) * u:.0f}" '
+                f'width="{size * 9 * u:.0f}" height="{(row * len(rows) + size * 0.6) * u:.0f}" '
+                f'fill="#061529" fill-opacity="0.9" rx="{size * 0.3 * u:.0f}"/>\n')
+        for color, label, lx, ly, lsize in rows:
+            f.write(f'<rect x="{lx * u:.0f}" y="{(ly - lsize * 0.75) * u:.0f}" width="{lsize * u:.0f}" '
+                    f'height="{lsize * u:.0f}" fill="{color}"/>\n'
+                    f'<text x="{(lx + lsize * 1.6) * u:.0f}" y="{ly * u:.0f}" font-family="Georgia, serif" '
+                    f'font-size="{lsize * u:.0f}" fill="#ffffff">{escape(label)}</text>\n')
+    f.write("</svg>\n")
+
+
+class _PdfWriter:
+    """Minimal PDF object writer that tracks byte offsets for the xref table"""
+
+    def __init__(self, f):
+        self.f = f
+        self.pos = 0
+        self.offsets = []
+        self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def write(self, data):
+        self.f.write(data)
+        self.pos += len(data)
+
+    def begin(self):
+        self.offsets.append(self.pos)
+        self.write(f"{len(self.offsets)} 0 obj\n".encode())
+        return len(self.offsets)
+
+    def obj(self, body):
+        number = self.begin()
+        self.write(body.encode() + b"\nendobj\n")
+        return number
+
+    def finish(self, root):
+        xref = self.pos
+        self.write(f"xref\n0 {len(self.offsets) + 1}\n0000000000 65535 f \n".encode())
+        for offset in self.offsets:
+            self.write(f"{offset:010d} 00000 n \n".encode())
+        self.write(f"trailer\n<< /Size {len(self.offsets) + 1} /Root {root} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def export_pdf(f, geometry, classes, style, width_cm, height_cm, dpi=300, layers=()):
+    """Stream a single-page PDF into a binary file object; the content stream is deflated as it is generated"""
+    from matplotlib.colors import to_rgb
+
+    width_pt, height_pt = width_cm / CM_PER_INCH * PT_PER_INCH, height_cm / CM_PER_INCH * PT_PER_INCH
+    background_color, show_legend = style[2], style[3]
+    pdf = _PdfWriter(f)
+    # Objects 1-4 are fixed so the page can reference the content stream and its length before they are written
+    pdf.obj("<< /Type /Catalog /Pages 2 0 R >>")
+    pdf.obj("<< /Type /Pages /Kids [3 0 R] /Count 1 >>")
+    pdf.obj(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] "
+            "/Resources << /Font << /F1 4 0 R >> /ExtGState << /G1 << /ca 0.9 >> >> >> /Contents 5 0 R >>")
+    pdf.obj("<< /Type /Font /Subtype /Type1 /BaseFont /Times-Roman >>")
+
+    pdf.begin()
+    pdf.write(b"<< /Length 6 0 R /Filter /FlateDecode >>\nstream\n")
+    start = pdf.pos
+    compressor = zlib.compressobj(6)
+
+    def emit(text):
+        pdf.write(compressor.compress(text.encode()))
+
+    # Paper units are 1/100 pt with y down; flip once with the current transformation matrix
+    emit(f"{1 / UNITS_PER_PT} 0 0 {-1 / UNITS_PER_PT} 0 {height_pt:.2f} cm 1 J 1 j\n")
+    if background_color != "none":
+        emit("{:.4f} {:.4f} {:.4f} rg 0 0 {} {} re f\n".format(
+            *to_rgb(background_color), round(width_pt * UNITS_PER_PT), round(height_pt * UNITS_PER_PT)))
+    for _, layer, color in layers:
+        if len(layer):
+            emit("{:.4f} {:.4f} {:.4f} rg\n".format(*to_rgb(color)))
+            for ring in paper_rings(layer, geometry.bounds, width_pt, height_pt, dpi):
+                coords = ring.ravel().tolist()
+                emit(f"{coords[0]} {coords[1]} m " + " ".join(f"{x} {y} l" for x, y in zip(coords[2::2], coords[3::2]))
+                     + " h\n")
+            # Nonzero winding, like the on-screen fill: holes run the other way round
+            emit("f\n")
+    for color, width, runs in _styled_runs(geometry, classes, style, width_pt, height_pt, dpi):
+        emit("{:.4f} {:.4f} {:.4f} RG {:.0f} w\n".format(*to_rgb(color), width * UNITS_PER_PT))
+        for run in runs:
+            coords = run.ravel().tolist()
+            emit(f"{coords[0]} {coords[1]} m " + " ".join(f"{x} {y} l" for x, y in zip(coords[2::2], coords[3::2])) + "\n")
+        emit("S\n")
+    if show_legend:
+        rows, (x, y0, size, row) = _legend_rows(style, width_pt, height_pt)
+        u = UNITS_PER_PT
+        emit(f"q /G1 gs 0.0235 0.0824 0.1608 rg {(x - size * 0.4) * u:.0f} {(y0 - size * 0.3) * u:.0f} "
+             f"{size * 9 * u:.0f} {(row * len(rows) + size * 0.6) * u:.0f} re f Q\n")
+        for color, label, lx, ly, lsize in rows:
+            emit("{:.4f} {:.4f} {:.4f} rg {:.0f} {:.0f} {:.0f} {:.0f} re f\n".format(
+                *to_rgb(color), lx * u, (ly - lsize * 0.75) * u, lsize * u, lsize * u))
+            # Text needs y up again locally so glyphs are not mirrored
+            text = label.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            emit(f"BT 1 1 1 rg /F1 {lsize * u:.0f} Tf 1 0 0 -1 {(lx + lsize * 1.6) * u:.0f} {ly * u:.0f} Tm ({text}) Tj ET\n")
+    pdf.write(compressor.flush())
+    length = pdf.pos - start
+    pdf.write(b"\nendstream\nendobj\n")
+    pdf.obj(str(length))
+    pdf.finish(root=1)
+
+
+def vector_download(geometry, classes, style, size_name, fmt, dpi=300, layers=()):
+    """Zero-argument callable for st.download_button that writes an SVG or PDF on click"""
+    def render():
+        width_cm, height_cm = PRINT_SIZES[size_name]
+        if fmt == "svg":
+            buf = io.StringIO()
+            export_svg(buf, geometry, classes, style, width_cm, height_cm, dpi, layers)
+            return buf.getvalue()
+        buf = io.BytesIO()
+        export_pdf(buf, geometry, classes, style, width_cm, height_cm, dpi, layers)
+        buf.seek(0)
+        return buf
+    return render